@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""build graphs of many series from a manifest, only ones out of date
+
+manifest (json), paths relative to the manifest
+{
+    "defaults": {"unitconv": 4.545e-7, "ignored_materials": ["Steam"], "cache": ".case_cache"},
+    "series": [
+        {
+            "output": "out/chemnetwork_v8.json",
+            "title": "zhichao demo",
+            "cases": [
+                {"id": "0c", "level_desc": "0 cent", "path": "data/results_0.json"},
+                ...
+            ],
+            "options": {"orient_edges": true}
+        },
+        ...
+    ]
+}
+
+options (defaults, overridden by options of each series)
+unitconv, ignored_materials, condense_defs, sparse, streaming: passed to OneCase
+  (condense_pgrp is not supported, readers have no product group demand)
+orient_edges: passed to SeriesBuilder
+indent, precision, compress: passed to export_graph.  with compress, .gz is
+  added to the names of output (and its lod and columnar files), and an
+  output named .gz is always compressed, so that readers can tell by name
+columnar: also write columnar version (export_graph_columnar)
+lod: also write levels of detail (export_lod)
+cache: directory of CaseCache, so unchanged cases are not read again
+
+each output gets a stamp (output name + .build.json) with hash of its
+inputs and options.  a series is rebuilt when any of its files (lod,
+columnar too) or the stamp is missing or the hash differs.  file content is hashed only when its
+size/mtime differ from the stamp.
+
+usage: python batch.py manifest.json [-j N] [--force] [--dry-run] [--verify] [--only output ...]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from case_cache import CaseCache, file_hash
+
+# bump when the same inputs/options give different output
+BUILD_VERSION = 1
+
+READ_OPTS = ('unitconv', 'ignored_materials', 'condense_defs', 'condense_pgrp', 'sparse', 'streaming')
+EXPORT_OPTS = ('indent', 'precision', 'compress')
+OPTS = READ_OPTS + EXPORT_OPTS + ('orient_edges', 'columnar', 'lod', 'cache')
+
+
+def load_manifest(fname):
+    """list of series (dict of output, title, cases, options) from manifest, paths resolved"""
+    fname = Path(fname)
+    base = fname.resolve().parent
+    with open(fname) as f:
+        man = json.load(f)
+    defaults = man.get('defaults', {})
+
+    jobs = []
+    outputs = set()
+    for s in man['series']:
+        opts = {**defaults, **s.get('options', {})}
+        unknown = set(opts) - set(OPTS)
+        if unknown:
+            raise ValueError(f"unknown options for {s['output']}: {sorted(unknown)}")
+        if opts.get('condense_pgrp'):
+            raise ValueError(f"condense_pgrp is not supported for {s['output']}: no product group demand in the cases")
+        if opts.get('cache') is not None:
+            opts['cache'] = str(base / opts['cache'])
+        output = base / s['output']
+        # file name tells whether it is gzipped, for the viewer and read_graph*()
+        if output.suffix == '.gz':
+            opts['compress'] = True
+        elif opts.get('compress'):
+            output = output.with_name(output.name + '.gz')
+        if output in outputs:
+            raise ValueError(f'{output} is output of more than one series')
+        outputs.add(output)
+        jobs.append({
+            'output': str(output),
+            'title': s.get('title'),
+            'cases': [{**c, 'path': str(base / c['path'])} for c in s['cases']],
+            'options': opts,
+            })
+    return jobs
+
+
+def columnar_path(output):
+    output = Path(output)
+    stem = output.name.removesuffix('.gz').removesuffix('.json')
+    return output.with_name(stem + '_columnar.json' + ('.gz' if output.suffix == '.gz' else ''))
+
+
+def outputs(job):
+    """all files written for series"""
+    from graph import lod_fnames
+    opts = job['options']
+    lst = lod_fnames(job['output']) if opts.get('lod') else [Path(job['output'])]
+    if opts.get('columnar'):
+        lst.append(columnar_path(job['output']))
+    return lst
+
+
+def stamp_path(output):
+    return Path(str(output) + '.build.json')
+
+
+def read_stamp(output):
+    p = stamp_path(output)
+    if not p.exists():
+        return None
+    try:
+        with open(p) as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def input_hashes(job, old=None):
+    """{path: {size, mtime_ns, sha256}} of cases, sha256 reused from old stamp when file looks the same"""
+    old = (old or {}).get('inputs', {})
+    out = {}
+    for c in job['cases']:
+        st = os.stat(c['path'])
+        o = old.get(c['path'])
+        if o is not None and o['size'] == st.st_size and o['mtime_ns'] == st.st_mtime_ns:
+            sha = o['sha256']
+        else:
+            sha = file_hash(c['path'])
+        out[c['path']] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha}
+    return out
+
+
+def job_key(job, inputs):
+    """hash of everything the output depends on"""
+    opts = {k: v for k, v in job['options'].items() if k != 'cache'}
+    cases = [{**c, 'path': inputs[c['path']]['sha256']} for c in job['cases']]
+    h = hashlib.sha256(json.dumps({'version': BUILD_VERSION, 'title': job['title'], 'cases': cases,
+        'options': opts}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def check(job):
+    """(stale, key, inputs) of series"""
+    old = read_stamp(job['output'])
+    inputs = input_hashes(job, old)
+    key = job_key(job, inputs)
+    stale = old is None or old.get('key') != key or not all(_.exists() for _ in outputs(job))
+    return stale, key, inputs
+
+
+def build(job, key=None, inputs=None):
+    """make the graph of series and save it, with its stamp"""
+    from series import SeriesBuilder
+    from graph import export_graph, export_lod
+    from columnar import export_graph_columnar
+    import reader_json_v1 as reader
+
+    if key is None:
+        _, key, inputs = check(job)
+    opts = job['options']
+    read_opts = {k: opts[k] for k in READ_OPTS if k in opts}
+    export_opts = {k: opts[k] for k in EXPORT_OPTS if k in opts}
+    cache = CaseCache(opts['cache']) if opts.get('cache') else None
+
+    # one case at a time, only the tensors are kept
+    builder = SeriesBuilder(orient_edges=opts.get('orient_edges', False))
+    for c in job['cases']:
+        builder.add(c['id'], reader.OneCase(c['path'], cache=cache, **read_opts))
+    descs = [c['level_desc'] for c in job['cases'] if 'level_desc' in c]
+    g, _ = builder.build(title=job['title'],
+            series_descs=descs if len(descs) == len(job['cases']) else None)
+
+    output = Path(job['output'])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if opts.get('lod'):
+        export_lod(g, output, **export_opts)
+    else:
+        export_graph(g, output, **export_opts)
+    if opts.get('columnar'):
+        export_graph_columnar(g, columnar_path(output), compress=export_opts.get('compress', False))
+
+    # stamp last, so that interrupted build is redone next time
+    tmp = stamp_path(output).with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'key': key, 'inputs': inputs}, f, indent=2)
+    tmp.replace(stamp_path(output))
+    return job['output']
+
+
+def verify(job):
+    """read back every file of series, as the viewer would, raises ValueError when one does not match
+
+    returns number of files read
+    """
+    from graph import read_graph
+    from columnar import read_graph_columnar
+    g = read_graph(job['output'])
+    files = outputs(job)
+    for fn in files:
+        if str(fn).removesuffix('.gz').endswith('_columnar.json'):
+            doc = read_graph_columnar(fn)
+            n = (doc['nodes']['length'], doc['links']['length'])
+            if n != (len(g['nodes']), len(g['links'])):
+                raise ValueError(f'{fn}: {n} nodes/links, {job["output"]} has {len(g["nodes"])}/{len(g["links"])}')
+        else:
+            gg = read_graph(fn)
+            if not gg['nodes'] or gg['graph'].get('series_labels') != g['graph'].get('series_labels'):
+                raise ValueError(f'{fn} does not match {job["output"]}')
+    return len(files)
+
+
+def run(jobs, workers=None, force=False, dry_run=False):
+    """build stale series, in parallel
+
+    workers: number of processes, None for number of cpus, 1 to run in this process
+    force: rebuild all
+    dry_run: only report what would be built
+
+    returns list of outputs (to be) built
+    """
+    todo = []
+    for job in jobs:
+        stale, key, inputs = check(job)
+        if stale or force:
+            todo.append((job, key, inputs))
+        print(f"{'build' if stale or force else 'ok   '} {job['output']}")
+    if dry_run or not todo:
+        return [j['output'] for j, _, _ in todo]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(todo))
+    if workers <= 1:
+        return [build(*_) for _ in todo]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(build, *zip(*todo)))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('manifest')
+    p.add_argument('-j', '--workers', type=int, default=None, help='number of processes (default number of cpus)')
+    p.add_argument('--force', action='store_true', help='rebuild all')
+    p.add_argument('--dry-run', action='store_true', help='only list what would be built')
+    p.add_argument('--verify', action='store_true', help='read back every output after the build')
+    p.add_argument('--only', nargs='+', help='outputs (file names) to consider')
+    args = p.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    if args.only:
+        # names as in the manifest, before .gz was added
+        jobs = [j for j in jobs if {Path(j['output']).name, Path(j['output']).name.removesuffix('.gz')} & set(args.only)
+                or j['output'] in args.only]
+    run(jobs, workers=args.workers, force=args.force, dry_run=args.dry_run)
+    if args.verify and not args.dry_run:
+        for job in jobs:
+            print(f"read {verify(job)} files of {job['output']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""benchmark OneCaseABC._mk_edges against the original per-process loop
+
+usage: python bench_edges.py [nmat nproc]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import reader_json_v1 as reader
+
+
+def mk_edges_loop(df_thru):
+    """original implementation of _mk_edges, kept for reference"""
+    dfa = df_thru.reset_index('material')
+    dct = {}
+    dcta = {}
+    for proc in dfa.index.unique():
+        df = dfa.loc[[proc], :]
+        dfc = df.loc[df.thru<0, :]
+        dfp = df.loc[df.thru>0, :]
+        totc = dfc.thru.sum()
+
+        for c in dfc.itertuples():
+            for p in dfp.itertuples():
+                e = dct.setdefault((c.material, p.material), {'flux': 0, })
+                v = c.thru * p.thru / totc
+                e['flux'] += v
+                dcta[(c.material, p.material, proc)] = {'flux': v}
+
+    idx = pd.MultiIndex.from_tuples(dct.keys(), names = ['material0', 'material1'])
+    df_edges = pd.DataFrame(dct.values(), index=idx)
+
+    idx = pd.MultiIndex.from_tuples(dcta.keys(), names = ['material0', 'material1', 'process'])
+    df_edges_byproc = pd.DataFrame(dcta.values(), index=idx)
+    return df_edges, df_edges_byproc
+
+
+def mk_throughput(nmat, nproc, ninp=3, nout=2, seed=0):
+    """random throughput dict of {material: {process: thru}}"""
+    rng = np.random.default_rng(seed)
+    dct = {}
+    for j in range(nproc):
+        mats = rng.choice(nmat, size=ninp+nout, replace=False)
+        x = rng.uniform(.1, 10.)
+        for k, m in enumerate(mats):
+            v = -rng.uniform(.1, 2.) * x if k < ninp else rng.uniform(.1, 1.) * x
+            dct.setdefault(f'M{m}', {})[f'P{j}'] = v
+    return dct
+
+
+def main(nmat=2000, nproc=5000):
+    with tempfile.TemporaryDirectory() as tdir:
+        fname = Path(tdir) / 'sln.json'
+        with open(fname, 'w') as f:
+            json.dump({'throughput': mk_throughput(nmat, nproc)}, f)
+        dat = reader.OneCase(fname)
+        df_thru = dat.df_thru
+        sdat = reader.OneCase(fname, sparse=True)
+        sdat.thru_matrix
+
+    t0 = time.perf_counter()
+    ref_edges, ref_edges_byproc = mk_edges_loop(df_thru)
+    t1 = time.perf_counter()
+    dat._mk_edges()
+    t2 = time.perf_counter()
+    sdat._mk_edges()
+    t3 = time.perf_counter()
+
+    pd.testing.assert_frame_equal(dat.df_edges, ref_edges)
+    pd.testing.assert_frame_equal(dat.df_edges_byproc, ref_edges_byproc)
+
+    print(f'materials={nmat} processes={nproc} edges={len(ref_edges)} edges_byproc={len(ref_edges_byproc)}')
+    print(f'loop:       {t1-t0:8.3f} s')
+    print(f'vectorized: {t2-t1:8.3f} s  ({(t1-t0)/(t2-t1):.0f}x)')
+    print(f'sparse:     {t3-t2:8.3f} s  ({(t1-t0)/(t3-t2):.0f}x)')
+
+
+if __name__ == '__main__':
+    main(*[int(_) for _ in sys.argv[1:3]])
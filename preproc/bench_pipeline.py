@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""benchmark the pipeline, stage by stage, on synthetic networks (synth.py)
+
+for each size, cases are generated and run through
+- read: OneCase from solution json (df_thru)
+- edges: derived frames (edges, flux, gross, ...)
+- add: SeriesBuilder.add(), frames of case kept
+- fold: SeriesBuilder.fold(), frames of all cases into tensors
+- frames: SeriesBuilder.build_frames(), folded tensors to frames/payloads
+- mk_graph: SeriesBuilder.build_graph(), graph construction
+- export: export_graph()
+- model: chemnetwork_model() from the inputs (--model, needs pyomo)
+
+wall time is from a run without tracing, peak memory (python
+allocations, tracemalloc) from a second run.  results are written as json
+records, and compared against earlier results with --compare.
+
+usage: python bench_pipeline.py [--sizes 1000x2000,5000x10000] [--cases 3] [--out bench.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import reader_json_v1 as reader
+import synth
+from graph import export_graph
+from series import SeriesBuilder
+
+STAGES = ['read', 'edges', 'add', 'fold', 'frames', 'mk_graph', 'export', 'model']
+
+
+class Recorder:
+    """wall time and (when traced) peak memory of stages, summed over cases"""
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.seconds = {}
+        self.peak = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        yield
+        self.seconds[name] = self.seconds.get(name, 0.) + time.perf_counter() - t0
+        if self.trace:
+            peak = tracemalloc.get_traced_memory()[1] - base
+            self.peak[name] = max(self.peak.get(name, 0), peak)
+
+
+def run(cases, minp, tdir, rec, model=False):
+    """run cases through the pipeline, recording each stage"""
+    builder = SeriesBuilder()
+    for c in cases:
+        with rec.stage('read'):
+            dat = reader.OneCase(c['path'])
+            dat.df_thru
+        with rec.stage('edges'):
+            dat.derived_frames()
+            dat.df_gross_prod
+            dat.df_gross_cons
+        with rec.stage('add'):
+            builder.add(c['id'], dat)
+        del dat
+    with rec.stage('fold'):
+        builder.fold()
+    with rec.stage('frames'):
+        dfs = builder.build_frames()
+    with rec.stage('mk_graph'):
+        g = builder.build_graph(dfs, title='bench')
+    with rec.stage('export'):
+        export_graph(g, Path(tdir) / 'graph.json')
+    if model:
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'pyomo'))
+        from chemnetwrk3 import chemnetwork_model
+        with rec.stage('model'):
+            chemnetwork_model(**synth.read_model_inputs(minp))
+
+
+def bench(nmat, nproc, ncase, model=False, seed=0):
+    """records of {nmat, nproc, ncase, stage, seconds, peak_mb} for one size"""
+    with tempfile.TemporaryDirectory() as tdir:
+        cases, minp = synth.write_cases(tdir, nmat, nproc, ncase, seed=seed)
+
+        rec = Recorder()
+        run(cases, minp, tdir, rec, model)
+
+        mrec = Recorder(trace=True)
+        tracemalloc.start()
+        try:
+            run(cases, minp, tdir, mrec, model)
+        finally:
+            tracemalloc.stop()
+
+    return [{'nmat': nmat, 'nproc': nproc, 'ncase': ncase, 'stage': s,
+        'seconds': rec.seconds[s], 'peak_mb': mrec.peak[s] / 2**20}
+        for s in STAGES if s in rec.seconds]
+
+
+def report(records, old=None):
+    """print table of records, with ratio to old records of same size/stage"""
+    ref = {}
+    for r in old or []:
+        ref[(r['nmat'], r['nproc'], r['ncase'], r['stage'])] = r
+    print(f"{'size':>14} {'stage':>8} {'seconds':>9} {'peak MB':>9}" + ('  time/old  mem/old' if old else ''))
+    for r in records:
+        size = f"{r['nmat']}x{r['nproc']}"
+        line = f"{size:>14} {r['stage']:>8} {r['seconds']:9.3f} {r['peak_mb']:9.1f}"
+        o = ref.get((r['nmat'], r['nproc'], r['ncase'], r['stage']))
+        if o is not None:
+            line += f"  {r['seconds'] / o['seconds']:8.2f} {r['peak_mb'] / max(o['peak_mb'], 1e-9):8.2f}"
+        print(line)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--sizes', default='1000x2000,5000x10000', help='comma separated nmat x nproc')
+    p.add_argument('--cases', type=int, default=3, help='number of cases in series')
+    p.add_argument('--model', action='store_true', help='time chemnetwork_model too')
+    p.add_argument('--out', help='json file to save the results')
+    p.add_argument('--compare', help='json file of earlier results')
+    args = p.parse_args(argv)
+
+    records = []
+    for size in args.sizes.split(','):
+        nmat, nproc = [int(_) for _ in size.split('x')]
+        records += bench(nmat, nproc, args.cases, args.model)
+
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+    report(records, old)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(records, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
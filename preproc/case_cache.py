@@ -0,0 +1,116 @@
+"""on-disk cache of derived dataframes of a case
+
+entries are keyed by hash of the input file plus the options that change
+the derived frames (unitconv, ignored_materials, condense_defs).  each
+entry is a directory of parquet files, one per frame.  least recently
+used entries are evicted when total size exceeds max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+# bump when layout/meaning of cached frames changes
+CACHE_VERSION = 1
+
+
+def file_hash(fname, blocksize=1<<20):
+    """sha256 of file content"""
+    h = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for blk in iter(lambda: f.read(blocksize), b''):
+            h.update(blk)
+    return h.hexdigest()
+
+
+class CaseCache:
+    """directory of cached frames
+
+    cachedir: directory to hold the entries
+    max_bytes: size limit for all entries, None for no limit
+    """
+
+    def __init__(self, cachedir='.case_cache', max_bytes=2<<30):
+        self.cachedir = Path(cachedir)
+        self.max_bytes = max_bytes
+        self.cachedir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, inpfile, **opts):
+        """cache key from input file content and options"""
+        h = hashlib.sha256()
+        h.update(file_hash(inpfile).encode())
+        h.update(json.dumps({'version': CACHE_VERSION, **opts},
+            sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return self.cachedir / key
+
+    def load(self, key):
+        """dict of {name: dataframe}, None if not in cache"""
+        p = self._path(key)
+        if not p.is_dir():
+            return None
+        try:
+            frames = {f.stem: pd.read_parquet(f) for f in p.glob('*.parquet')}
+        except (OSError, ValueError):
+            # broken entry
+            self.invalidate(key)
+            return None
+        os.utime(p)
+        return frames
+
+    def store(self, key, frames):
+        """save dict of {name: dataframe}, then evict old entries"""
+        p = self._path(key)
+        tmp = Path(tempfile.mkdtemp(dir=self.cachedir, prefix='.tmp_'))
+        try:
+            for name, df in frames.items():
+                df.to_parquet(tmp / f'{name}.parquet')
+            if p.is_dir():
+                shutil.rmtree(p)
+            tmp.rename(p)
+        finally:
+            if tmp.is_dir():
+                shutil.rmtree(tmp)
+        self.evict()
+
+    def invalidate(self, key=None):
+        """drop one entry, or all entries when key is None"""
+        if key is None:
+            for p in self.entries():
+                shutil.rmtree(p, ignore_errors=True)
+        else:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def invalidate_file(self, inpfile, **opts):
+        """drop entry for input file and options"""
+        self.invalidate(self.key(inpfile, **opts))
+
+    def entries(self):
+        """entry directories, least recently used first"""
+        lst = [p for p in self.cachedir.iterdir() if p.is_dir() and not p.name.startswith('.')]
+        return sorted(lst, key=lambda p: p.stat().st_mtime)
+
+    def size(self, p=None):
+        """size in bytes of an entry, or the whole cache"""
+        lst = [p] if p is not None else self.entries()
+        return sum(f.stat().st_size for q in lst for f in q.iterdir())
+
+    def evict(self):
+        """remove least recently used entries until within max_bytes"""
+        if self.max_bytes is None:
+            return
+        entries = self.entries()
+        sizes = [self.size(p) for p in entries]
+        total = sum(sizes)
+        for p, s in zip(entries, sizes):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(p, ignore_errors=True)
+            total -= s
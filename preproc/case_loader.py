@@ -0,0 +1,102 @@
+"""load series of cases in parallel
+
+each case is read and its derived frames (edges etc) are made in a worker
+process.  frames are sent back to the parent as integer coded arrays,
+and set on a OneCase in the parent, so that nothing is recomputed there.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import profiling
+import reader_json_v1 as reader
+from onecase import Categories
+
+
+def pack_frame(df):
+    """dataframe to dict of arrays, index levels integer coded"""
+    idx = df.index
+    if isinstance(idx, pd.MultiIndex):
+        codes = [np.asarray(_) for _ in idx.codes]
+        levels = [_.to_numpy() for _ in idx.levels]
+    else:
+        c, lvl = pd.factorize(idx)
+        codes = [c.astype(np.int32)]
+        levels = [np.asarray(lvl)]
+    return {
+            'names': list(idx.names),
+            'codes': codes,
+            'levels': levels,
+            'columns': {c: df[c].to_numpy() for c in df.columns},
+            }
+
+
+def unpack_frame(dct):
+    """dict from pack_frame() back to dataframe"""
+    if len(dct['codes']) > 1:
+        idx = pd.MultiIndex(levels=dct['levels'], codes=dct['codes'], names=dct['names'])
+    else:
+        idx = pd.Index(dct['levels'][0][dct['codes'][0]], name=dct['names'][0])
+    return pd.DataFrame(dct['columns'], index=idx)
+
+
+def _load_one(path, kwds, label=None, prof=None):
+    """worker, read a case and make its derived frames
+
+    prof: profiling.options() of the parent, spans are sent back with the frames
+    """
+    if prof is not None:
+        profiling.enable_worker(prof)
+    with profiling.span('case', case=label):
+        dat = reader.OneCase(path, **kwds)
+        frames = {name: pack_frame(df) for name, df in dat.derived_frames().items()}
+    return frames, profiling.records()
+
+
+def load_cases(cases, workers=None, lean=False, float32=False, **kwds):
+    """read cases and make derived frames using pool of processes
+
+    input
+    cases: list of dict with 'id' and 'path'
+    workers: number of processes, None for number of cpus, 1 to run in this process
+    lean: make cases lean (OneCaseABC.make_lean) with dictionaries shared across cases,
+        memory before/after is in .memory of each case
+    float32: with lean, keep values as float32
+    kwds: passed to OneCase (unitconv, ignored_materials etc.)
+
+    output
+    dict of {id: OneCase objects}, in order of cases
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(cases))
+    categories = Categories() if lean else None
+
+    if workers <= 1:
+        dats = {}
+        for case in cases:
+            with profiling.span('case', case=case['id']):
+                dat = reader.OneCase(case['path'], **kwds)
+                dat.derived_frames()
+            if lean:
+                dat.make_lean(categories, float32)
+            dats[case['id']] = dat
+        return dats
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        prof = profiling.options()
+        futs = {case['id']: ex.submit(_load_one, case['path'], kwds, case['id'], prof) for case in cases}
+        paths = {case['id']: case['path'] for case in cases}
+        dats = {}
+        for k, fut in futs.items():
+            packed, recs = fut.result()
+            # spans of workers, memory is of the worker process
+            profiling.merge(recs)
+            frames = {name: unpack_frame(_) for name, _ in packed.items()}
+            dats[k] = reader.OneCase(paths[k], frames=frames, **kwds)
+            if lean:
+                dats[k].make_lean(categories, float32)
+    return dats
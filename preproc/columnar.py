@@ -0,0 +1,250 @@
+"""compact columnar graph file for the viewer
+
+node-link json (nx.node_link_data) repeats every attribute key for every
+node/link, and process names for every case of series_flux_byproc.  this
+format stores the graph as tables instead:
+
+{
+  "format": "chemnetwork-columnar", "version": 1,
+  "directed": .., "multigraph": .., "graph": {..},   # same as node-link
+  "dicts": {"material": [names], "process": [names]},
+  "nodes": {"length": N, "id": ARR, "columns": {name: COL}},
+  "links": {"length": E, "source": ARR, "target": ARR, "columns": {name: COL}},
+  "buffers": [sidecar file name]                      # binary=True only
+}
+
+ids/source/target are codes into dicts.material, and COL is one of
+  {"kind": "scalar", "data": ARR(float64)}          nan where absent
+  {"kind": "series", "ncol": ncase, "data": ARR(float32, length*ncase)}
+  {"kind": "byproc", "ncol": ncase, "ptr": ARR(int32, length+1),
+   "process": ARR(int32), "data": ARR(float32, nnz*ncase)}
+                                                    ncol 0 for single dict
+  {"kind": "json", "data": [value or null]}         anything else
+
+and ARR is a typed array, either inline {"dtype", "b64"} (base64 of little
+endian bytes) or in the sidecar {"dtype", "buffer", "offset", "length"}.
+the viewer (load_graph in chemnetworkviz js) reads it into typed arrays
+directly.
+"""
+
+import base64
+import gzip
+import json
+import numbers
+from pathlib import Path
+
+import numpy as np
+
+FORMAT = 'chemnetwork-columnar'
+VERSION = 1
+
+
+def _open(fname, mode, compress):
+    return gzip.open(fname, mode) if compress else open(fname, mode)
+
+
+class _ArrayWriter:
+    """encodes arrays, inline or into sidecar buffer"""
+
+    def __init__(self, binary):
+        self.binary = binary
+        self.chunks = []
+        self.nbytes = 0
+
+    def __call__(self, arr, dtype):
+        arr = np.ascontiguousarray(arr, dtype=np.dtype(dtype).newbyteorder('<'))
+        if not self.binary:
+            return {'dtype': dtype, 'b64': base64.b64encode(arr.tobytes()).decode('ascii')}
+        # keep 8 byte alignment, for typed array views in the browser
+        pad = -self.nbytes % 8
+        if pad:
+            self.chunks.append(b'\0' * pad)
+            self.nbytes += pad
+        dct = {'dtype': dtype, 'buffer': 0, 'offset': self.nbytes, 'length': len(arr)}
+        self.chunks.append(arr.tobytes())
+        self.nbytes += arr.nbytes
+        return dct
+
+
+def _is_num(v):
+    return isinstance(v, numbers.Number) and not isinstance(v, bool)
+
+
+def _columns(attrs, procs, enc):
+    """list of attribute dicts (one per node/link) to columns"""
+    n = len(attrs)
+    names = []
+    for a in attrs:
+        for k in a:
+            if k not in names:
+                names.append(k)
+
+    cols = {}
+    for name in names:
+        vals = [a.get(name) for a in attrs]
+        present = [v for v in vals if v is not None]
+
+        if all(_is_num(v) for v in present):
+            cols[name] = {'kind': 'scalar',
+                    'data': enc([np.nan if v is None else v for v in vals], 'float64')}
+
+        elif all(isinstance(v, (list, tuple)) and all(_is_num(_) for _ in v) for v in present) \
+                and len(set(len(v) for v in present)) == 1:
+            ncol = len(present[0])
+            arr = np.zeros((n, ncol), dtype=np.float32)
+            for i, v in enumerate(vals):
+                if v is not None:
+                    arr[i] = v
+            cols[name] = {'kind': 'series', 'ncol': ncol, 'data': enc(arr.ravel(), 'float32')}
+
+        elif all(isinstance(v, dict) for v in present) or \
+                all(isinstance(v, (list, tuple)) and all(isinstance(_, dict) for _ in v) for v in present):
+            # dict of {process: value}, or list of them (one for each case)
+            single = all(isinstance(v, dict) for v in present)
+            ncol = 0 if single else len(present[0])
+            ptr = [0]
+            pcodes = []
+            data = []
+            for v in vals:
+                if v is None:
+                    v = {} if single else [{}] * ncol
+                cases = [v] if single else v
+                keys = list(dict.fromkeys(k for c in cases for k in c))
+                pcodes.extend(procs.setdefault(k, len(procs)) for k in keys)
+                data.extend([c.get(k, 0.) for c in cases] for k in keys)
+                ptr.append(len(pcodes))
+            data = np.asarray(data, dtype=np.float32).reshape(len(pcodes), max(ncol, 1))
+            cols[name] = {'kind': 'byproc', 'ncol': ncol, 'ptr': enc(ptr, 'int32'),
+                    'process': enc(pcodes, 'int32'), 'data': enc(data.ravel(), 'float32')}
+
+        else:
+            cols[name] = {'kind': 'json', 'data': vals}
+    return cols
+
+
+def export_graph_columnar(g, fname, binary=False, compress=False):
+    """save NX graph to columnar json file
+
+    g: networkx graph (from process_series/process_single)
+    fname: output file name
+    binary: arrays go to sidecar file (fname with .bin suffix) instead of inline base64
+    compress: gzip the output file(s)
+    """
+    fname = Path(fname)
+    enc = _ArrayWriter(binary)
+    mats = {}
+    procs = {}
+
+    nodes = list(g.nodes(data=True))
+    links = list(g.edges(data=True))
+    nid = [mats.setdefault(k, len(mats)) for k, _ in nodes]
+    src = [mats.setdefault(u, len(mats)) for u, _, _ in links]
+    tgt = [mats.setdefault(v, len(mats)) for _, v, _ in links]
+
+    doc = {
+            'format': FORMAT,
+            'version': VERSION,
+            'directed': g.is_directed(),
+            'multigraph': g.is_multigraph(),
+            'graph': g.graph,
+            'nodes': {
+                'length': len(nodes),
+                'id': enc(nid, 'int32'),
+                'columns': _columns([a for _, a in nodes], procs, enc),
+                },
+            'links': {
+                'length': len(links),
+                'source': enc(src, 'int32'),
+                'target': enc(tgt, 'int32'),
+                'columns': _columns([a for _, _, a in links], procs, enc),
+                },
+            }
+    doc['dicts'] = {'material': list(mats), 'process': list(procs)}
+
+    if binary:
+        stem = fname.name.removesuffix('.gz').removesuffix('.json')
+        bname = fname.with_name(stem + '.bin' + ('.gz' if compress else ''))
+        doc['buffers'] = [bname.name]
+        with _open(bname, 'wb', compress) as f:
+            for chunk in enc.chunks:
+                f.write(chunk)
+
+    with _open(fname, 'wt', compress) as f:
+        json.dump(doc, f)
+
+
+def _decode(arr, buffers):
+    dtype = np.dtype(arr['dtype']).newbyteorder('<')
+    if 'b64' in arr:
+        return np.frombuffer(base64.b64decode(arr['b64']), dtype=dtype)
+    return np.frombuffer(buffers[arr['buffer']], dtype=dtype, count=arr['length'], offset=arr['offset'])
+
+
+def read_graph_columnar(fname):
+    """read columnar json file
+
+    returns the document with every ARR decoded to numpy array, nodes/links
+    are not expanded
+    """
+    fname = Path(fname)
+    compress = fname.suffix == '.gz'
+    with _open(fname, 'rt', compress) as f:
+        doc = json.load(f)
+    if doc.get('format') != FORMAT:
+        raise ValueError(f'{fname} is not {FORMAT} file')
+    buffers = []
+    for b in doc.get('buffers', []):
+        with _open(fname.parent / b, 'rb', b.endswith('.gz')) as f:
+            buffers.append(f.read())
+
+    def dec(obj):
+        if isinstance(obj, dict):
+            if 'dtype' in obj:
+                return _decode(obj, buffers)
+            return {k: dec(v) for k, v in obj.items()}
+        return obj
+
+    for part in ('nodes', 'links'):
+        doc[part] = dec(doc[part])
+    return doc
+
+
+def node_link_from_columnar(doc):
+    """expand document from read_graph_columnar() to node-link dict, for QA"""
+    mats = doc['dicts']['material']
+    procs = doc['dicts']['process']
+
+    def rows(tbl):
+        out = [{} for _ in range(tbl['length'])]
+        for name, col in tbl['columns'].items():
+            kind = col['kind']
+            if kind == 'scalar':
+                for o, v in zip(out, col['data'].tolist()):
+                    if not np.isnan(v):
+                        o[name] = v
+            elif kind == 'series':
+                for o, v in zip(out, col['data'].reshape(-1, col['ncol']).tolist()):
+                    o[name] = v
+            elif kind == 'byproc':
+                ptr = col['ptr']
+                ncol = col['ncol']
+                data = col['data'].reshape(-1, max(ncol, 1))
+                for i, o in enumerate(out):
+                    p = [procs[_] for _ in col['process'][ptr[i]:ptr[i+1]]]
+                    v = data[ptr[i]:ptr[i+1]].T.tolist()
+                    o[name] = dict(zip(p, v[0])) if ncol == 0 else [dict(zip(p, _)) for _ in v]
+            else:
+                for o, v in zip(out, col['data']):
+                    if v is not None:
+                        o[name] = v
+        return out
+
+    nodes = rows(doc['nodes'])
+    for o, i in zip(nodes, doc['nodes']['id']):
+        o['id'] = mats[i]
+    links = rows(doc['links'])
+    for o, s, t in zip(links, doc['links']['source'], doc['links']['target']):
+        o['source'] = mats[s]
+        o['target'] = mats[t]
+    return {'directed': doc['directed'], 'multigraph': doc['multigraph'], 'graph': doc['graph'],
+            'nodes': nodes, 'links': links}
@@ -0,0 +1,250 @@
+"""graph document of the network, and its export to json for the viewer
+
+mk_graph() makes the graph (GraphDoc, or networkx digraph) from edge list
+and node/link attributes, export_graph() and export_lod() save it
+"""
+
+import gzip
+import json
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from prune import prune_graph
+import profiling
+
+
+class GraphDoc:
+    """node-link document of a directed graph, made by mk_graph_doc()
+
+    provides the part of networkx graph interface used by update_meta() and
+    the exporters (graph, is_directed(), nodes(data=True), edges(data=True))
+    """
+
+    def __init__(self, node_ids, node_attrs, sources, targets, link_attrs, graph=None):
+        self.node_ids = node_ids
+        self.node_attrs = node_attrs
+        self.sources = sources
+        self.targets = targets
+        self.link_attrs = link_attrs
+        self.graph = {} if graph is None else graph
+
+    def is_directed(self):
+        return True
+
+    def is_multigraph(self):
+        return False
+
+    def nodes(self, data=False):
+        return list(zip(self.node_ids, self.node_attrs)) if data else list(self.node_ids)
+
+    def edges(self, data=False):
+        if data:
+            return list(zip(self.sources, self.targets, self.link_attrs))
+        return list(zip(self.sources, self.targets))
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.sources)
+
+    def to_networkx(self):
+        """same graph as nx.DiGraph, for QA"""
+        g = nx.DiGraph(**self.graph)
+        g.add_nodes_from(self.nodes(data=True))
+        g.add_edges_from(self.edges(data=True))
+        return g
+
+
+def _set_attrs(rows, index, sources):
+    """set attributes on rows (list of dict) matched by index
+
+    sources: list of dataframe (index matched to index, one attribute for each column)
+        or dict of {key: {name: value}}.  keys not in index are ignored
+    """
+    for src in sources or []:
+        if isinstance(src, pd.DataFrame):
+            pos = index.get_indexer(src.index)
+            keep = pos >= 0
+            pos = pos[keep].tolist()
+            for col in src.columns:
+                for i, v in zip(pos, src[col].to_numpy()[keep].tolist()):
+                    rows[i][col] = v
+        elif len(src):
+            keys = list(src.keys())
+            if isinstance(index, pd.MultiIndex):
+                keys = pd.MultiIndex.from_tuples(keys)
+            for i, d in zip(index.get_indexer(keys).tolist(), src.values()):
+                if i >= 0:
+                    rows[i].update(d)
+
+
+def mk_graph_doc(df_edges, node_attrs = None, edge_attrs = None):
+    """generate graph document from edge list, without networkx
+
+    attributes are joined column-wise.  nodes, links and their attributes
+    come in the same order as the NX graph from mk_graph(use_nx=True), so is
+    the exported json
+    """
+    e = df_edges.reset_index()
+    src = e['material0'].to_numpy(dtype=object)
+    tgt = e['material1'].to_numpy(dtype=object)
+
+    # nodes in order of appearance in edge list
+    ends = np.empty(2 * len(e), dtype=object)
+    ends[0::2] = src
+    ends[1::2] = tgt
+    codes, nodes = pd.factorize(ends)
+    nodes = pd.Index(nodes)
+
+    # links grouped by source node, as in adjacency of DiGraph
+    order = np.argsort(codes[0::2], kind='stable')
+    src = src[order]
+    tgt = tgt[order]
+
+    node_rows = [{} for _ in range(len(nodes))]
+    _set_attrs(node_rows, nodes, node_attrs)
+
+    link_rows = [{} for _ in range(len(e))]
+    _set_attrs(link_rows, pd.RangeIndex(len(e)), [e.drop(columns=['material0', 'material1']).iloc[order].reset_index(drop=True)])
+    _set_attrs(link_rows, pd.MultiIndex.from_arrays([src, tgt]), edge_attrs)
+
+    return GraphDoc(nodes.tolist(), node_rows, src.tolist(), tgt.tolist(), link_rows)
+
+
+def mk_graph(df_edges, node_attrs = None, edge_attrs = None, use_nx = False):
+    """generate graph from edge list
+
+    node_attrs, edge_attrs: list of dataframe or dict of dicts
+    use_nx: make NX graph, otherwise GraphDoc (see mk_graph_doc())
+    """
+    if not use_nx:
+        return mk_graph_doc(df_edges, node_attrs, edge_attrs)
+
+    g = nx.from_pandas_edgelist(df_edges.reset_index(), 
+            source='material0', 
+            target='material1', 
+            edge_attr=True,
+            create_using=nx.DiGraph)
+    if node_attrs is not None:
+        for dct in node_attrs:
+            if isinstance(dct, pd.DataFrame):
+                dct = dct.to_dict(orient='index')
+            nx.set_node_attributes(g, dct)
+    if edge_attrs is not None:
+        for dct in edge_attrs:
+            if isinstance(dct, pd.DataFrame):
+                dct = dct.to_dict(orient='index')
+            nx.set_edge_attributes(g, dct)
+
+    return g
+
+
+def _round_floats(obj, precision):
+    """round floats in nested dict/list to significant digits"""
+    if isinstance(obj, float):
+        return float(f'{obj:.{precision}g}')
+    if isinstance(obj, dict):
+        return {k: _round_floats(v, precision) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_round_floats(v, precision) for v in obj]
+    return obj
+
+
+def export_graph(g, fname='d3/chemnetwork.json', indent=2, precision=None, compress=False):
+    """save NX graph (or GraphDoc) to json file
+
+    nodes and links are written one at a time, so memory does not grow
+    with the output.  output is the same as json.dumps(nx.node_link_data(g), indent=indent)
+    with edges under "links" (as the viewer expects)
+
+    indent: indentation, None for compact
+    precision: significant digits for floats, None for full precision
+    compress: gzip the output
+    """
+    if indent is None:
+        nl, ind1, ind2, sep = '', '', '', ', '
+    else:
+        nl, ind1, ind2, sep = '\n', ' ' * indent, ' ' * (2 * indent), ','
+
+    def dump(obj, level):
+        if precision is not None:
+            obj = _round_floats(obj, precision)
+        s = json.dumps(obj, indent=indent)
+        if indent is not None:
+            s = s.replace('\n', '\n' + ' ' * (level * indent))
+        return s
+
+    def write_list(f, key, items, last=False):
+        f.write(f'{ind1}{json.dumps(key)}: [')
+        first = True
+        for item in items:
+            f.write((nl if first else sep + nl) + ind2 + dump(item, 2))
+            first = False
+        if not first:
+            f.write(nl + ind1)
+        f.write(']' + ('' if last else sep) + nl)
+
+    opener = gzip.open if compress else open
+    with profiling.span('export'), opener(fname, 'wt') as f:
+        f.write('{' + nl)
+        f.write(f'{ind1}"directed": {dump(g.is_directed(), 1)}{sep}{nl}')
+        f.write(f'{ind1}"multigraph": {dump(g.is_multigraph(), 1)}{sep}{nl}')
+        f.write(f'{ind1}"graph": {dump(g.graph, 1)}{sep}{nl}')
+        write_list(f, 'nodes', ({**d, 'id': n} for n, d in g.nodes(data=True)))
+        write_list(f, 'links', ({**d, 'source': u, 'target': v} for u, v, d in g.edges(data=True)), last=True)
+        f.write('}')
+
+def read_graph(fname):
+    """node-link dict from json file of export_graph(), gzipped when the name ends with .gz (as the viewer reads it)"""
+    opener = gzip.open if str(fname).endswith('.gz') else open
+    with opener(fname, 'rt') as f:
+        return json.load(f)
+
+# levels of export_lod(), coarse to fine (the full graph comes last)
+LOD_LEVELS = ({'rel_threshold': 1e-3, 'top_k': 5}, {'rel_threshold': 1e-5})
+
+def lod_fnames(fname, nlevels=len(LOD_LEVELS)):
+    """files written by export_lod(), coarse to full: fname with _lod0, _lod1, ... added, then fname"""
+    fname = Path(fname)
+    stem = fname.name.removesuffix('.gz').removesuffix('.json')
+    suffix = fname.name[len(stem):]
+    return [fname.with_name(f'{stem}_lod{i}{suffix}') for i in range(nlevels)] + [fname]
+
+def export_lod(g, fname, levels=LOD_LEVELS, other=True, **kwds):
+    """save levels of detail of graph, coarse to full
+
+    each of levels is options to prune_graph(), and the unpruned graph is the
+    last level.  files are fname with _lod0, _lod1, ... added to its stem,
+    except the last one which is fname itself.  graph.lod of each file
+    lists all the files, so that the viewer can open coarse one first
+
+    kwds: passed to export_graph() (indent, precision, compress)
+
+    returns list of file names, coarse to full
+    """
+    fnames = lod_fnames(fname, len(levels))
+    levels = list(levels) + [{'rel_threshold': None, 'top_k': None}]
+    for i, (lvl, fn) in enumerate(zip(levels, fnames)):
+        gg = prune_graph(g, other=other, **lvl)
+        gg.graph['lod'] = {'level': i, 'files': [_.name for _ in fnames]}
+        export_graph(gg, fn, **kwds)
+    return fnames
+
+def update_meta(g, inpdat):
+    """atach metadata for materials/processes"""
+    dct = {}
+    if 'df_material_defs' in inpdat:
+        dct.update(inpdat['df_material_defs'].to_dict(orient='records'))
+    if 'df_process_defs' in inpdat:
+        dct.update(inpdat['df_process_defs'].to_dict(orient='records'))
+    g.graph.update(dct)
+
+    #g.graph.update({
+    #    #'scale': scale, 
+    #    'material_desc': inpdat['df_material_defs'].to_dict(orient='records'),
+    #    'process_desc': inpdat['df_process_defs'].to_dict(orient='records'),
+    #    })
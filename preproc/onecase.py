@@ -1,16 +1,190 @@
 from abc import ABC, abstractmethod
+import sys
 import pandas as pd
+import numpy as np
+
+# condensed flow smaller than this fraction of its gross flows is dropped
+CONDENSE_TOL = 1e-9
+
+def pair_by_group(grp_c, grp_p, ngrp):
+    """all combinations of consumer and producer sharing the same group
+
+    grp_c, grp_p: sorted group code (e.g. process) of consumers/producers
+    ngrp: number of groups
+
+    returns index arrays into grp_c and grp_p, ordered by consumer then producer
+    """
+    nprod = np.bincount(grp_p, minlength=ngrp)
+    pstart = np.cumsum(nprod) - nprod
+    cnt = nprod[grp_c]
+    kc = np.repeat(np.arange(len(grp_c)), cnt)
+    offset = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    kp = np.repeat(pstart[grp_c], cnt) + offset
+    return kc, kp
+
+
+def canonical_edges(m0, m1):
+    """unordered (canonical) key of edges
+
+    m0, m1: array-like of source/target material names
+
+    returns 4-tuple of
+    lo, hi: integer codes of the two ends, lo < hi
+    fwd: True where edge goes lo -> hi
+    names: material names for the codes
+    """
+    n = len(m0)
+    codes, names = pd.factorize(np.concatenate([np.asarray(m0, dtype=object), np.asarray(m1, dtype=object)]))
+    c0, c1 = codes[:n], codes[n:]
+    return np.minimum(c0, c1), np.maximum(c0, c1), c0 < c1, pd.Index(names)
+
+
+def pick_edge_orientation(indexes):
+    """single orientation for each unordered edge, across cases
+
+    indexes: list of edge MultiIndex (material0, material1), one for each case
+
+    returns MultiIndex of oriented edges, orientation is the one appeared first
+    """
+    m0 = np.concatenate([idx.get_level_values(0).to_numpy(dtype=object) for idx in indexes])
+    m1 = np.concatenate([idx.get_level_values(1).to_numpy(dtype=object) for idx in indexes])
+    lo, hi, fwd, names = canonical_edges(m0, m1)
+    _, first = np.unique(lo.astype(np.int64) * len(names) + hi, return_index=True)
+    first.sort()
+    return pd.MultiIndex.from_arrays([m0[first], m1[first]], names=['material0', 'material1'])
+
+
+def deep_sizeof(obj):
+    """approximate memory of nested dict/list of python objects (or numpy arrays), in bytes"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, np.ndarray):
+            total += o.nbytes
+            if o.dtype == object:
+                stack.extend(o.ravel().tolist())
+            continue
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set)):
+            stack.extend(o)
+    return total
+
+
+class Categories:
+    """material/process names shared by cases of a series (lean mode)
+
+    indexes of lean cases are integer codes into these.  names only grow
+    (new ones appended), so codes given earlier stay valid, and earlier
+    dictionaries are prefixes of later ones
+    """
+
+    # index level name: dictionary
+    kinds = {'material': 'material', 'material0': 'material', 'material1': 'material', 'process': 'process'}
+
+    def __init__(self):
+        self.material = pd.Index([], dtype=object, name='material')
+        self.process = pd.Index([], dtype=object, name='process')
+
+    def encode(self, kind, values):
+        """codes of values (adding names not seen yet), and the dictionary"""
+        values = pd.Index(values)
+        idx = getattr(self, kind)
+        codes = idx.get_indexer(values)
+        miss = codes < 0
+        if miss.any():
+            idx = idx.append(values[miss].unique())
+            setattr(self, kind, idx)
+            codes[miss] = idx.get_indexer(values[miss])
+        return codes.astype(np.int32), idx
+
+    def lean_index(self, index):
+        """index (or MultiIndex) recoded against shared dictionaries
+
+        MultiIndex levels become the shared dictionaries, single index
+        becomes CategoricalIndex.  names not material/process are kept as is
+        """
+        if isinstance(index, pd.MultiIndex):
+            codes = []
+            for lvl, cds, name in zip(index.levels, index.codes, index.names):
+                if name in self.kinds:
+                    lc, _ = self.encode(self.kinds[name], lvl)
+                    cds = lc[cds]
+                codes.append(cds)
+            # dictionaries after all levels are encoded (codes of earlier ones stay valid)
+            levels = [getattr(self, self.kinds[n]) if n in self.kinds else l for l, n in zip(index.levels, index.names)]
+            return pd.MultiIndex(levels=levels, codes=codes, names=index.names, verify_integrity=False)
+        kind = self.kinds.get(index.name, 'material')
+        codes, dct = self.encode(kind, index)
+        return pd.CategoricalIndex(pd.Categorical.from_codes(codes, categories=dct), name=index.name)
+
+
+class ArrayFrames:
+    """frames from sections held as arrays (self.arr), laid out as
+    stream_json.read_case() output: positions into arr['materials'] and
+    arr['processes'], and values.  mixin of OneCaseABC readers
+    (reader_json_v1 when streaming, reader_pyomo)
+    """
+
+    def _frame_1d(self, key):
+        """single column dataframe from section, indexed by material"""
+        codes, vals = self.arr[key]
+        idx = pd.Index(self.arr['materials'][codes], name='material')
+        return pd.DataFrame({key: vals}, index=idx)
+
+    def _frame_2d(self, key, name):
+        """single column dataframe from section, MultiIndex of material/process"""
+        imat, iproc, vals = self.arr[key]
+        idx = pd.MultiIndex.from_arrays(
+                [self.arr['materials'][imat], self.arr['processes'][iproc]],
+                names=['material', 'process'])
+        return pd.DataFrame({name: vals}, index=idx)
+
+    def _arr_thru_matrix(self):
+        from thru_matrix import ThruMatrix
+        imat, iproc, thru = self.arr['throughput']
+        return ThruMatrix.from_arrays(self.arr['materials'][imat], self.arr['processes'][iproc], thru)
+
+    def _arr_df_thru(self):
+        return self._condense_thru(self._frame_2d('throughput', 'thru'))
+
+    def _arr_df_net_prod(self):
+        return self._condense_1d(self._frame_1d('net_prod'))
+
 
 class OneCaseABC(ABC):
 
-    def __init__(self, unitconv=1., ignored_materials=[], condense_defs={}, condense_pgrp=False):
+    # derived frames saved to/loaded from CaseCache
+    cached_frames = ('df_thru', 'df_flux', 'df_flux_byproc', 'df_edges', 'df_edges_byproc',
+            'df_gross_prod', 'df_gross_cons', 'df_demand', 'df_supply', 'df_unconstrained_raw')
+
+    def __init__(self, unitconv=1., ignored_materials=[], condense_defs={}, condense_pgrp=False,
+            sparse=False, cache=None):
 
         self.unitconv = unitconv
         self.ignored_materials = ignored_materials
 
+        # sparse == True uses material x process sparse matrix (ThruMatrix)
+        # for edges/flux/gross prod/cons, dataframes are made only when accessed
+        self.sparse = sparse
+
+        # cache: CaseCache to keep derived frames on disk
+        self.cache = cache
+        self._cache_key = None
+
         # condense species
-        # condense_defs condenses arbitrarily set of species
-        # consend_pgrp == True condenses pgrp (product groups) as well
+        # condense_defs condenses arbitrarily set of species, dict of {group: [materials]}
+        # condense_pgrp (condense product groups too) is not supported, readers
+        # have no product group demand to put on the group node
+        # materials are remapped to groups in df_thru (and demand/supply etc)
+        # before edges are made
         def _proc_condense(condense_defs):
 
             if condense_defs is None or len(condense_defs) == 0: return None
@@ -25,17 +199,7 @@ class OneCaseABC(ABC):
             return df
 
         if condense_pgrp:
-            #
-            if inpdat is None:
-                raise ValueError('need to pass inpdat when condens_pgrp is True')
-            #x = pd.DataFrame([{'group':_.keys[0], 'member':_.keys[1]} for _ in db_inp['pgrp_i']])
-            #x = x.groupby('group')['member'].apply(list).to_dict()
-            x = inpdat['dct_pgrp_defs']
-
-            if condense_defs is None:
-                condense_defs = x
-            else:
-                condense_defs = {**condense_defs, **x}
+            raise ValueError('condense_pgrp is not supported, no product group demand in the case')
 
         self.condense_pgrp = condense_pgrp
         self.condense_defs = _proc_condense(condense_defs)
@@ -54,6 +218,11 @@ class OneCaseABC(ABC):
         self._df_flux_byproc = None
         self._df_edges = None
         self._df_edges_byproc = None
+        self._thru_matrix = None
+
+        # Categories of lean case (make_lean())
+        self.categories = None
+        self.memory = None
 
         self._df_pgrp = None
         self._dct_pgrp_defs = None
@@ -154,9 +323,191 @@ class OneCaseABC(ABC):
         pass
 
 
-    
+    def _cache_opts(self):
+        """options that change derived frames, part of the cache key"""
+        return {
+                'unitconv': self.unitconv,
+                'ignored_materials': sorted(self.ignored_materials),
+                'condense_defs': (None if self.condense_defs is None
+                    else sorted(self.condense_defs['grouped'].items())),
+                'condense_pgrp': self.condense_pgrp,
+                # frames of sparse/streaming runs differ in row order and rounding
+                'sparse': self.sparse,
+                'streaming': getattr(self, 'streaming', False),
+                }
+
+    def _load_cache(self, inpfile):
+        """set derived frames from cache, returns True if found"""
+        self._cache_key = self.cache.key(inpfile, **self._cache_opts())
+        frames = self.cache.load(self._cache_key)
+        if frames is None:
+            return False
+        self._set_frames(frames)
+        return True
+
+    def _store_cache(self):
+        """save derived frames to cache"""
+        self.cache.store(self._cache_key, self.derived_frames())
+
+    def _condense_materials(self, materials):
+        """material names to group names (condense_defs), as array"""
+        materials = pd.Index(materials)
+        grp = materials.map(self.condense_defs['grouped'])
+        return np.where(pd.isna(grp), materials.to_numpy(dtype=object), grp.to_numpy(dtype=object))
+
+    def _condense_thru(self, df):
+        """df_thru with materials remapped to groups, summed for each process
+
+        flows between members of a group in a process (e.g. one grade consumed,
+        another produced) net out, and are dropped when they balance
+        """
+        if self.condense_defs is None:
+            return df
+        v = df['thru'].to_numpy()
+        g = pd.DataFrame({
+            'material': self._condense_materials(df.index.get_level_values('material')),
+            'process': df.index.get_level_values('process'),
+            'thru': v,
+            'gross': np.abs(v),
+            }).groupby(['material', 'process'], sort=False).sum()
+        keep = g['thru'].abs() > CONDENSE_TOL * g['gross']
+        return g.loc[keep, ['thru']]
+
+    def _condense_1d(self, df):
+        """material indexed frame (demand, supply etc) with materials remapped to groups, summed"""
+        if self.condense_defs is None:
+            return df
+        idx = pd.Index(self._condense_materials(df.index), name=df.index.name)
+        return df.groupby(idx, sort=False).sum()
+
+    def _mk_gross(self):
+        """gross consumption/production from df_thru"""
+        thru = self.df_thru['thru']
+        mat = thru.index.get_level_values('material')
+        for name, v in (('gross_cons', thru.clip(upper=0)), ('gross_prod', thru.clip(lower=0))):
+            v = v.groupby(mat, sort=False).sum()
+            df = v[v != 0].to_frame(name)
+            df.index.name = 'material'
+            setattr(self, '_df_' + name, df)
+
+    def _release_raw(self):
+        """let go of raw input, once the frames are made (lean mode)"""
+        pass
+
+    def _raw_nbytes(self):
+        """memory of raw input kept"""
+        return 0
+
+    def memory_usage(self):
+        """memory of the case, in bytes
+
+        dict of {frame name: bytes} of frames made so far, and 'raw' for raw
+        input.  indexes of lean case count their codes only, as dictionaries
+        are shared by cases of a series
+        """
+        out = {}
+        for name in self.cached_frames:
+            df = getattr(self, '_' + name, None)
+            if df is None:
+                continue
+            if self.categories is None:
+                out[name] = int(df.memory_usage(index=True, deep=True).sum())
+            else:
+                idx = df.index
+                codes = idx.codes if isinstance(idx, pd.MultiIndex) else [idx.codes]
+                out[name] = int(df.memory_usage(index=False, deep=True).sum() + sum(c.nbytes for c in codes))
+        out['raw'] = self._raw_nbytes()
+        return out
+
+    def make_lean(self, categories=None, float32=False):
+        """make derived frames compact, and release raw input
+
+        categories: Categories shared across cases (new one if None), material
+            and process indexes become integer codes into it
+        float32: store values as float32
+
+        returns dict of total memory 'before' and 'after' (see memory_usage()),
+        and 'shared' for the dictionaries, in bytes
+        """
+        frames = self.derived_frames()
+        before = sum(self.memory_usage().values())
+        if categories is None:
+            categories = Categories()
+        for name, df in frames.items():
+            df = df.set_axis(categories.lean_index(df.index), axis=0)
+            if float32:
+                df = df.astype({c: np.float32 for c in df.columns if df[c].dtype == np.float64})
+            setattr(self, '_' + name, df)
+        self.categories = categories
+        self._thru_matrix = None
+        self._release_raw()
+        after = sum(self.memory_usage().values())
+        shared = int(categories.material.memory_usage(deep=True) + categories.process.memory_usage(deep=True))
+        self.memory = {'before': before, 'after': after, 'shared': shared}
+        return self.memory
+
+    def _set_frames(self, frames):
+        """set derived frames, dict of {name: dataframe}"""
+        for name, df in frames.items():
+            setattr(self, '_' + name, df)
+
+    def derived_frames(self):
+        """dict of derived frames listed in cached_frames, built as needed"""
+        frames = {}
+        for name in self.cached_frames:
+            try:
+                frames[name] = getattr(self, name)
+            except KeyError:
+                # section not in input
+                pass
+        return frames
+
+    def _mk_thru_matrix(self):
+        """ThruMatrix straight from the input, before condensing, None to make it from df_thru"""
+        return None
+
+    @property
+    def thru_matrix(self):
+        """throughput as ThruMatrix (sparse material x process)"""
+        if self._thru_matrix is None:
+            tm = self._mk_thru_matrix()
+            if tm is None:
+                from thru_matrix import ThruMatrix
+                tm = ThruMatrix.from_frame(self.df_thru)
+            elif self.condense_defs is not None:
+                tm = tm.condense(self.condense_defs['grouped'])
+            self._thru_matrix = tm
+        return self._thru_matrix
+
+    def _gross(self, name, from_input):
+        """df_gross_prod/df_gross_cons (name without df_), from_input() makes it from the input"""
+        attr = '_df_' + name
+        if getattr(self, attr) is None and self.sparse:
+            self._mk_gross_sparse()
+        if getattr(self, attr) is None and self.condense_defs is not None:
+            # internal flows of groups are gone, so not from the input
+            self._mk_gross()
+        if getattr(self, attr) is None:
+            setattr(self, attr, from_input())
+        return getattr(self, attr)
+
+    def _mk_gross_sparse(self):
+        """gross consumption/production from sparse throughput"""
+        tm = self.thru_matrix
+        for name, v in (('gross_cons', tm.gross_cons()), ('gross_prod', tm.gross_prod())):
+            keep = v != 0
+            df = pd.DataFrame({name: v[keep]}, index=tm.materials[keep])
+            setattr(self, '_df_' + name, df)
+
     def _mk_flux(self):
         """Flux across node"""
+        if self.sparse:
+            tm = self.thru_matrix
+            v = tm.flux()
+            keep = v != 0
+            self._df_flux = pd.DataFrame({'flux': v[keep]}, index=tm.materials[keep])
+            return
+
         df_flux = pd.concat([
             self.df_gross_cons.rename({'gross_cons':'flux'}, axis=1).reset_index(), 
             self.df_gross_prod.rename({'gross_prod':'flux'}, axis=1).reset_index()])
@@ -170,27 +521,133 @@ class OneCaseABC(ABC):
 
 
     def _mk_edges(self):
-        """helper function to generate edgelist """
-        dfa = self.df_thru.reset_index('material')
-        dct = {}
-        dcta = {}
-        for proc in dfa.index.unique():
-            df = dfa.loc[[proc], :]
-            dfc = df.loc[df.thru<0, :]
-            dfp = df.loc[df.thru>0, :]
-            totc = dfc.thru.sum()
-            totp = dfp.thru.sum()
-            err = totc + totp
-
-            for c in dfc.itertuples():
-                for p in dfp.itertuples():
-                    e = dct.setdefault((c.material, p.material), {'flux': 0, })
-                    v = c.thru * p.thru / totc
-                    e['flux'] += v
-                    dcta[(c.material, p.material, proc)] = {'flux': v}
-
-        idx = pd.MultiIndex.from_tuples(dct.keys(), names = ['material0', 'material1'])
-        self._df_edges = pd.DataFrame(dct.values(), index=idx)
-
-        idx = pd.MultiIndex.from_tuples(dcta.keys(), names = ['material0', 'material1', 'process'])
-        self._df_edges_byproc = pd.DataFrame(dcta.values(), index=idx)
+        """helper function to generate edgelist
+
+        for each process, flux of each consumed material is allocated to each
+        produced material in proportion to production.  materials/processes
+        are integer coded so that all processes are handled at once
+        """
+        if self.sparse:
+            self._mk_edges_sparse()
+            return
+
+        dfa = self.df_thru.reset_index()
+
+        # integer code, in order of appearance
+        mat_codes, mat_names = pd.factorize(dfa['material'])
+        proc_codes, proc_names = pd.factorize(dfa['process'])
+        thru = dfa['thru'].to_numpy(dtype=float)
+        nproc = len(proc_names)
+
+        # consumer/producer rows, grouped by process (stable, keeps row order)
+        ic = np.flatnonzero(thru < 0)
+        ip = np.flatnonzero(thru > 0)
+        ic = ic[np.argsort(proc_codes[ic], kind='stable')]
+        ip = ip[np.argsort(proc_codes[ip], kind='stable')]
+
+        totc = np.bincount(proc_codes[ic], weights=thru[ic], minlength=nproc)
+
+        # consumer x producer pairs within each process
+        kc, kp = pair_by_group(proc_codes[ic], proc_codes[ip], nproc)
+        rc = ic[kc]
+        rp = ip[kp]
+        rproc = proc_codes[rc]
+
+        v = thru[rc] * thru[rp] / totc[rproc]
+
+        idx = pd.MultiIndex.from_arrays(
+                [mat_names[mat_codes[rc]], mat_names[mat_codes[rp]], proc_names[rproc]],
+                names = ['material0', 'material1', 'process'])
+        self._df_edges_byproc = pd.DataFrame({'flux': v}, index=idx)
+
+        # sum across processes, edges in order of appearance
+        key = mat_codes[rc].astype(np.int64) * len(mat_names) + mat_codes[rp]
+        inv, ekey = pd.factorize(key)
+        flux = np.bincount(inv, weights=v, minlength=len(ekey))
+        idx = pd.MultiIndex.from_arrays(
+                [mat_names[ekey // len(mat_names)], mat_names[ekey % len(mat_names)]],
+                names = ['material0', 'material1'])
+        self._df_edges = pd.DataFrame({'flux': flux}, index=idx)
+
+    def _mk_edges_sparse(self):
+        """_mk_edges with sparse linear algebra on thru_matrix"""
+        tm = self.thru_matrix
+        mats = tm.materials
+
+        c, p, proc, v = tm.edges_byproc()
+        idx = pd.MultiIndex.from_arrays(
+                [mats[c], mats[p], tm.processes[proc]],
+                names = ['material0', 'material1', 'process'])
+        self._df_edges_byproc = pd.DataFrame({'flux': v}, index=idx)
+
+        e = tm.edges()
+        idx = pd.MultiIndex.from_arrays(
+                [mats[e.row], mats[e.col]],
+                names = ['material0', 'material1'])
+        self._df_edges = pd.DataFrame({'flux': e.data}, index=idx)
+
+    def condense_dual_edges(self):
+        """net out dual edges (a->b and b->a) into single edge
+
+        direction with larger flux is kept, flux is the difference.  flux_byproc
+        is signed relative to the kept direction, i.e. processes on the dropped
+        direction become negative
+        """
+        e = self.df_edges
+        m0 = e.index.get_level_values(0)
+        m1 = e.index.get_level_values(1)
+        lo, hi, fwd, names = canonical_edges(m0, m1)
+        key = lo.astype(np.int64) * len(names) + hi
+        ikey, ukey = pd.factorize(key)
+        net = np.bincount(ikey, weights=np.where(fwd, 1., -1.) * e['flux'].to_numpy(), minlength=len(ukey))
+        ulo, uhi = ukey // len(names), ukey % len(names)
+        dirn = np.where(net >= 0, 1., -1.)
+
+        idx = pd.MultiIndex.from_arrays(
+                [names[np.where(dirn > 0, ulo, uhi)], names[np.where(dirn > 0, uhi, ulo)]],
+                names = ['material0', 'material1'])
+        self._df_edges = pd.DataFrame({'flux': np.abs(net)}, index=idx)
+
+        # by process, signed against kept direction
+        eb = self.df_edges_byproc
+        b0 = eb.index.get_level_values(0).to_numpy(dtype=object)
+        b1 = eb.index.get_level_values(1).to_numpy(dtype=object)
+        c0 = names.get_indexer(b0)
+        c1 = names.get_indexer(b1)
+        bkey = np.minimum(c0, c1).astype(np.int64) * len(names) + np.maximum(c0, c1)
+        ibkey = pd.Index(ukey).get_indexer(bkey)
+        iproc, procs = pd.factorize(eb.index.get_level_values(2))
+        ikp, ukp = pd.factorize(ibkey.astype(np.int64) * len(procs) + iproc)
+        v = np.where(c0 < c1, 1., -1.) * dirn[ibkey] * eb['flux'].to_numpy()
+        v = np.bincount(ikp, weights=v, minlength=len(ukp))
+        upair, uproc = ukp // len(procs), ukp % len(procs)
+
+        idx = pd.MultiIndex.from_arrays(
+                [idx.get_level_values(0)[upair], idx.get_level_values(1)[upair], procs[uproc]],
+                names = ['material0', 'material1', 'process'])
+        self._df_edges_byproc = pd.DataFrame({'flux': v}, index=idx)
+
+    def specify_edge_orientation(self, edgelist):
+        """flip edges to match given orientation
+
+        edgelist: MultiIndex (or list of tuples) of oriented edges, from pick_edge_orientation()
+
+        edge whose reverse is in edgelist is flipped, and its flux (and
+        flux_byproc) changes sign
+        """
+        if not isinstance(edgelist, pd.MultiIndex):
+            edgelist = pd.MultiIndex.from_tuples(edgelist, names=['material0', 'material1'])
+
+        def flip(df):
+            m0 = df.index.get_level_values(0)
+            m1 = df.index.get_level_values(1)
+            fwd = pd.MultiIndex.from_arrays([m0, m1]).isin(edgelist)
+            rev = pd.MultiIndex.from_arrays([m1, m0]).isin(edgelist)
+            flp = rev & ~fwd
+            lvls = [np.where(flp, m1, m0), np.where(flp, m0, m1)]
+            lvls.extend(df.index.get_level_values(i) for i in range(2, df.index.nlevels))
+            idx = pd.MultiIndex.from_arrays(lvls, names=df.index.names)
+            return pd.DataFrame({'flux': np.where(flp, -1., 1.) * df['flux'].to_numpy()}, index=idx)
+
+        self._df_edges = flip(self.df_edges)
+        self._df_edges_byproc = flip(self.df_edges_byproc)
@@ -0,0 +1,203 @@
+"""timing and peak memory of stages, off unless enabled
+
+spans (with profiling.span('name'): ...) record wall time and, with
+memory, peak of python allocations (tracemalloc) above the start of the
+span.  spans nest, and a span given case= tags itself and everything
+inside with the case, for per-case breakdown.  OneCase lazy properties
+get their own spans once instrument() is called on the class (done by
+enable() for the readers).
+
+enable by enable(), or environment variables
+CHEMNET_PROFILE: json report to write
+CHEMNET_PROFILE_MEMORY: 0 not to trace memory (tracing slows things down)
+CHEMNET_CPROFILE: cProfile dump (.prof) to write too
+
+when not enabled span() is a shared no-op context, and classes are not
+touched, so nothing is added to the work.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+_NULL = contextlib.nullcontext()
+_state = None
+
+
+class _Span:
+    def __init__(self, name, case):
+        self.name = name
+        self.case = case
+
+    def __enter__(self):
+        st = _state
+        parent = st['stack'][-1] if st['stack'] else None
+        self.path = self.name if parent is None else parent.path + '/' + self.name
+        if self.case is None and parent is not None:
+            self.case = parent.case
+        if st['memory']:
+            cur, peak = tracemalloc.get_traced_memory()
+            # peak so far belongs to open spans, then start over for this one
+            for s in st['stack']:
+                s.peak = max(s.peak, peak)
+            tracemalloc.reset_peak()
+            self.base = self.peak = cur
+        st['stack'].append(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.t0
+        st = _state
+        st['stack'].pop()
+        rec = {'path': self.path, 'case': self.case, 'seconds': seconds}
+        if st['memory']:
+            cur, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            if st['stack']:
+                st['stack'][-1].peak = max(st['stack'][-1].peak, self.peak)
+            rec['peak_mb'] = (self.peak - self.base) / 2**20
+            rec['net_mb'] = (cur - self.base) / 2**20
+        st['records'].append(rec)
+        return False
+
+
+def enabled():
+    return _state is not None
+
+
+def enable(report=None, memory=True, cprofile=None):
+    """start recording
+
+    report: json file written by write_report()
+    memory: trace peak memory
+    cprofile: cProfile dump written by write_report()
+    """
+    global _state
+    if _state is not None:
+        return
+    _state = {'report': report, 'memory': memory, 'cprofile': None, 'cprofile_fname': cprofile,
+            'stack': [], 'records': [], 't0': time.perf_counter()}
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if cprofile is not None:
+        import cProfile
+        _state['cprofile'] = cProfile.Profile()
+        _state['cprofile'].enable()
+
+    import onecase
+    import reader_json_v1
+    import reader_pyomo
+    for cls in (onecase.OneCaseABC, reader_json_v1.OneCase, reader_pyomo.OneCase):
+        instrument(cls)
+
+
+def enable_from_env():
+    """enable() if CHEMNET_PROFILE or CHEMNET_CPROFILE is set"""
+    report = os.environ.get('CHEMNET_PROFILE')
+    cprofile = os.environ.get('CHEMNET_CPROFILE')
+    if report or cprofile:
+        enable(report, os.environ.get('CHEMNET_PROFILE_MEMORY', '1') != '0', cprofile)
+
+
+def options():
+    """arguments of enable() in effect, None when not enabled (to enable in worker process)"""
+    if _state is None:
+        return None
+    return {'memory': _state['memory']}
+
+
+def span(name, case=None):
+    """context recording time (and memory) of the block"""
+    if _state is None:
+        return _NULL
+    return _Span(name, case)
+
+
+def _lazy(name, fget):
+    # only time the access that makes the frame, not ones returning cached
+    attr = '_' + name
+
+    @functools.wraps(fget)
+    def wrapper(self):
+        if _state is None or getattr(self, attr, None) is not None:
+            return fget(self)
+        with _Span(name, None):
+            return fget(self)
+    wrapper._profiled = True
+    return wrapper
+
+
+def instrument(cls):
+    """put spans on lazy properties (df_*, thru_matrix) defined in cls"""
+    for name, prop in list(vars(cls).items()):
+        if not isinstance(prop, property) or getattr(prop.fget, '_profiled', False):
+            continue
+        if not (name.startswith('df_') or name == 'thru_matrix'):
+            continue
+        setattr(cls, name, property(_lazy(name, prop.fget), prop.fset, prop.fdel, prop.__doc__))
+
+
+def records():
+    """list of finished spans"""
+    return [] if _state is None else list(_state['records'])
+
+
+def merge(recs, prefix=None):
+    """add records from elsewhere (worker process), paths under prefix"""
+    if _state is None:
+        return
+    if prefix is None and _state['stack']:
+        prefix = _state['stack'][-1].path
+    for r in recs:
+        _state['records'].append({**r, 'path': r['path'] if prefix is None else prefix + '/' + r['path']})
+
+
+def summary():
+    """report as dict
+
+    stages: {path: {calls, seconds, peak_mb}} across cases
+    cases: {case: {path: {calls, seconds, peak_mb}}}
+    """
+    def add(dct, r):
+        s = dct.setdefault(r['path'], {'calls': 0, 'seconds': 0.})
+        s['calls'] += 1
+        s['seconds'] += r['seconds']
+        if 'peak_mb' in r:
+            s['peak_mb'] = max(s.get('peak_mb', 0.), r['peak_mb'])
+
+    stages = {}
+    cases = {}
+    for r in records():
+        add(stages, r)
+        if r['case'] is not None:
+            add(cases.setdefault(r['case'], {}), r)
+    return {'total_seconds': time.perf_counter() - _state['t0'] if _state else 0.,
+            'memory': bool(_state and _state['memory']),
+            'stages': stages, 'cases': cases}
+
+
+def write_report(report=None):
+    """write json report (and cProfile dump), returns summary()"""
+    if _state is None:
+        return None
+    if _state['cprofile'] is not None:
+        _state['cprofile'].disable()
+        _state['cprofile'].dump_stats(_state['cprofile_fname'])
+    out = summary()
+    report = report or _state['report']
+    if report:
+        with open(report, 'w') as f:
+            json.dump(out, f, indent=2)
+    return out
+
+
+def enable_worker(opts):
+    """enable() in worker process with options() of the parent, dropping
+    state inherited by fork"""
+    global _state
+    _state = None
+    enable(**opts)
@@ -0,0 +1,115 @@
+"""drop small edges from graph before export
+
+edges are ranked by flux (max of |series_flux| across cases for series
+graph), and dropped when below relative threshold of the largest node
+flux, or not among top-k edges of either of its ends.  flux of dropped
+edges can be kept as edges to/from one "other" node, so that what flows
+in/out of each node stays the same.
+
+works on graph from process_single/process_series (GraphDoc or networkx),
+and returns the same kind of graph.
+"""
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+OTHER = '(other)'
+
+
+def _series(attrs):
+    """flux of nodes/links as 2-d array (item x case), and whether it is series"""
+    if attrs and all('series_flux' in a for a in attrs):
+        return np.array([a['series_flux'] for a in attrs], dtype=float), True
+    return np.array([[a.get('flux', 0.)] for a in attrs], dtype=float).reshape(len(attrs), 1), False
+
+
+def _rank(codes, mag):
+    """rank (0 for largest) of mag within each group of codes"""
+    order = np.lexsort((-mag, codes))
+    c = codes[order]
+    start = np.r_[0, np.flatnonzero(np.diff(c)) + 1]
+    pos = np.arange(len(c)) - np.repeat(start, np.diff(np.r_[start, len(c)]))
+    rank = np.empty(len(c), dtype=int)
+    rank[order] = pos
+    return rank
+
+
+def prune_mask(g, rel_threshold=1e-5, top_k=None):
+    """True for edges to keep, in order of g.edges()
+
+    rel_threshold: edges with flux below this fraction of max node flux are dropped, None to keep all
+    top_k: edges not among top_k largest of either its source or target are dropped, None to keep all
+    """
+    links = list(g.edges(data=True))
+    nodes = list(g.nodes(data=True))
+    emag = np.abs(_series([d for _, _, d in links])[0]).max(axis=1, initial=0.)
+    nmag = np.abs(_series([d for _, d in nodes])[0]).max(axis=1, initial=0.)
+
+    keep = np.ones(len(links), dtype=bool)
+    if rel_threshold is not None and len(nmag):
+        keep &= emag >= rel_threshold * nmag.max()
+    if top_k is not None and len(links):
+        src, _ = pd.factorize(pd.Index([u for u, _, _ in links]))
+        tgt, _ = pd.factorize(pd.Index([v for _, v, _ in links]))
+        keep &= (_rank(src, emag) < top_k) | (_rank(tgt, emag) < top_k)
+    return keep
+
+
+def prune_graph(g, rel_threshold=1e-5, top_k=None, other=False):
+    """graph with small edges dropped (see prune_mask())
+
+    other: add edges node -> OTHER (and OTHER -> node) carrying flux of
+        dropped edges, so that in/out flows of nodes are unchanged.
+        otherwise nodes left without edge are dropped too
+    """
+    links = list(g.edges(data=True))
+    nodes = list(g.nodes(data=True))
+    keep = prune_mask(g, rel_threshold, top_k)
+
+    new_links = [l for l, k in zip(links, keep) if k]
+    new_nodes = nodes
+    if not other:
+        used = set(u for u, _, _ in new_links) | set(v for _, v, _ in new_links)
+        new_nodes = [n for n in nodes if n[0] in used]
+
+    elif not keep.all():
+        flux, is_series = _series([d for _, _, d in links])
+        drop = ~keep
+        ncase = flux.shape[1]
+        other_in = np.zeros(ncase)
+        other_out = np.zeros(ncase)
+        for end, direction in ((0, 'out'), (1, 'in')):
+            names = pd.Index([l[end] for l in links])[drop]
+            codes, uniq = pd.factorize(names)
+            sums = np.zeros((len(uniq), ncase))
+            np.add.at(sums, codes, flux[drop])
+            for n, v in zip(uniq, sums.tolist()):
+                if is_series:
+                    d = {'flux': max(v), 'series_flux': v, 'series_flux_byproc': [{} for _ in v]}
+                else:
+                    d = {'flux': v[0], 'flux_byproc': {}}
+                new_links.append((n, OTHER, d) if direction == 'out' else (OTHER, n, d))
+            if direction == 'out':
+                other_in = sums.sum(axis=0)
+            else:
+                other_out = sums.sum(axis=0)
+        v = np.maximum(np.abs(other_in), np.abs(other_out)).tolist()
+        if is_series:
+            d = {'series_flux': v, 'series_flux_byproc': [{} for _ in v], 'other': True}
+        else:
+            d = {'flux': v[0], 'flux_byproc': {}, 'other': True}
+        new_nodes = nodes + [(OTHER, d)]
+
+    graph = dict(g.graph)
+    graph['pruned'] = {'rel_threshold': rel_threshold, 'top_k': top_k, 'other': other,
+            'edges': int((~keep).sum())}
+
+    if isinstance(g, nx.Graph):
+        out = nx.DiGraph(**graph)
+        out.add_nodes_from(new_nodes)
+        out.add_edges_from(new_links)
+        return out
+    return type(g)([n for n, _ in new_nodes], [d for _, d in new_nodes],
+            [u for u, _, _ in new_links], [v for _, v, _ in new_links], [d for _, _, d in new_links],
+            graph)
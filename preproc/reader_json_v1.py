@@ -3,46 +3,106 @@ import pandas as pd
 import json
 from importlib import reload
 reload(onecase)
+import stream_json
+
+class OneCase(onecase.ArrayFrames, onecase.OneCaseABC):
+    def __init__(self, inpfile, unitconv = 1, ignored_materials=[], condense_defs={}, condense_pgrp=False,
+            sparse=False, streaming=False, cache=None, frames=None):
+        onecase.OneCaseABC.__init__(self, unitconv=unitconv, ignored_materials=ignored_materials,
+                condense_defs=condense_defs, condense_pgrp=condense_pgrp, sparse=sparse,
+                cache=cache)
+
+        # streaming == True reads the file incrementally into typed arrays
+        # (self.arr), raw dict (self.inp) is not kept
+        self.inpfile = inpfile
+        self.streaming = streaming
+        self._inp = None
+        self._arr = None
+
+        # with derived frames given (e.g. made by another process) or found in cache,
+        # file is read only when raw sections are accessed
+        if frames is not None:
+            self._set_frames(frames)
+        elif self.cache is not None and self._load_cache(inpfile):
+            pass
+        else:
+            self._read()
+            if self.cache is not None:
+                self._store_cache()
+
+    def _read(self):
+        if self.streaming:
+            self._arr = stream_json.read_case(self.inpfile)
+        else:
+            with open(self.inpfile, 'r') as f:
+                self._inp = json.loads(f.read())
+
+    @property
+    def inp(self):
+        """raw input dict, None when streaming"""
+        if self._inp is None and self._arr is None:
+            self._read()
+        return self._inp
+
+    @property
+    def arr(self):
+        """arrays from stream_json.read_case, None when not streaming"""
+        if self._inp is None and self._arr is None:
+            self._read()
+        return self._arr
+
+    def _release_raw(self):
+        # read again if raw sections are needed later
+        self._inp = None
+        self._arr = None
+
+    def _raw_nbytes(self):
+        return onecase.deep_sizeof(self._inp if self._inp is not None else self._arr)
 
-class OneCase(onecase.OneCaseABC):
-    def __init__(self, inpfile, unitconv = 1, ignored_materials=[]):
-        onecase.OneCaseABC.__init__(self, unitconv=unitconv, ignored_materials=ignored_materials)
-        with open(inpfile, 'r') as f:
-            self.inp = json.loads(f.read())
-    
     @property
     def df_material(self):
+        if self.streaming:
+            return self.arr['i']
         return self.inp['i']
 
     @property
     def df_process(self):
+        if self.streaming:
+            return self.arr['j']
         return self.inp['j']
 
     @property
     def df_iom(self):
+        if self.streaming:
+            return self._frame_2d('a', 'a')
         return self.inp['a']
 
     @property
     def df_demand(self):
+        if self._df_demand is None and self.streaming:
+            self._df_demand = self._condense_1d(self._frame_1d('demand'))
         if self._df_demand is None:
             df = pd.DataFrame.from_dict(self.inp['demand'], orient='index', columns=['demand'])
             df.index.name = 'material'
-            self._df_demand = df
+            self._df_demand = self._condense_1d(df)
         return self._df_demand
 
     @property
     def df_supply(self):
+        if self._df_supply is None and self.streaming:
+            self._df_supply = self._condense_1d(self._frame_1d('supply'))
         if self._df_supply is None:
             df = pd.DataFrame.from_dict(self.inp['supply'], orient='index', columns=['supply'])
             df.index.name = 'material'
-            self._df_supply = df
+            self._df_supply = self._condense_1d(df)
         return self._df_supply
 
     @property
     def df_unconstrained_raw(self):
         if self._df_unconstrained_raw is None:
-            df = pd.DataFrame([], index=pd.Index(self.inp['unconstrained_raw']))
-            self._df_unconstrained_raw = df
+            lst = self.arr['unconstrained_raw'] if self.streaming else self.inp['unconstrained_raw']
+            df = pd.DataFrame([], index=pd.Index(lst))
+            self._df_unconstrained_raw = self._condense_1d(df)
         return self._df_unconstrained_raw
 
     @property
@@ -77,8 +137,18 @@ class OneCase(onecase.OneCaseABC):
             self._mk_edges()
         return self._df_edges_byproc
 
+    def _mk_thru_matrix(self):
+        from thru_matrix import ThruMatrix
+        if self.streaming:
+            return self._arr_thru_matrix()
+        return ThruMatrix.from_dict(self.inp['throughput'])
+
     @property
     def df_thru(self):
+        if self._df_thru is None and self.sparse:
+            self._df_thru = self.thru_matrix.to_frame()
+        if self._df_thru is None and self.streaming:
+            self._df_thru = self._arr_df_thru()
         if self._df_thru is None:
             dct = self.inp['throughput']
             dat = []
@@ -86,7 +156,7 @@ class OneCase(onecase.OneCaseABC):
                 for proc, vv in v.items():
                     dat.append([mat, proc, vv])
             df = pd.DataFrame(dat, columns=['material', 'process', 'thru']).set_index(['material', 'process'])
-            self._df_thru = df
+            self._df_thru = self._condense_thru(df)
 
 
         return self._df_thru
@@ -94,22 +164,23 @@ class OneCase(onecase.OneCaseABC):
 
     @property
     def df_net_prod(self):
-        return self.inp['net_cons']
+        if self._df_net_prod is None and self.streaming:
+            self._df_net_prod = self._arr_df_net_prod()
+        if self._df_net_prod is None:
+            self._df_net_prod = self.inp['net_cons']
+        return self._df_net_prod
+
+    def _input_gross(self, name):
+        if self.streaming:
+            return self._frame_1d(name)
+        df = pd.DataFrame.from_dict(self.inp[name], orient='index', columns=[name])
+        df.index.name = 'material'
+        return df
 
     @property
     def df_gross_prod(self):
-        if self._df_gross_prod is None:
-            df = pd.DataFrame.from_dict(self.inp['gross_prod'], orient='index', columns=['gross_prod'])
-            df.index.name = 'material'
-            self._df_gross_prod = df
+        return self._gross('gross_prod', lambda: self._input_gross('gross_prod'))
 
-        return self._df_gross_prod
     @property
     def df_gross_cons(self):
-        if self._df_gross_cons is None:
-            df = pd.DataFrame.from_dict(self.inp['gross_cons'], orient='index', columns=['gross_cons'])
-            df.index.name = 'material'
-            self._df_gross_cons = df
-
-        return self._df_gross_cons
-
+        return self._gross('gross_cons', lambda: self._input_gross('gross_cons'))
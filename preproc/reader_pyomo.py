@@ -0,0 +1,130 @@
+"""case from solved chemnetwork_model, without going through solution json
+
+sections are arrays from extract_solution() in pyomo/chemnetwrk3.py, laid
+out as stream_json.read_case() output (positions into material/process
+arrays), and frames are made from them by onecase.ArrayFrames, as for
+streaming reader_json_v1.OneCase.
+"""
+
+import numpy as np
+import pandas as pd
+
+import onecase
+
+
+class OneCase(onecase.ArrayFrames, onecase.OneCaseABC):
+    def __init__(self, sln, unitconv=1, ignored_materials=[], condense_defs={}, condense_pgrp=False,
+            sparse=False, unconstrained_raw=None):
+        """
+        sln: solved ConcreteModel, or dict of arrays from extract_solution()
+             (chemnetwrk3 has to be importable for ConcreteModel)
+        unconstrained_raw: list of unconstrained raw materials, when sln is a model
+        """
+        onecase.OneCaseABC.__init__(self, unitconv=unitconv, ignored_materials=ignored_materials,
+                condense_defs=condense_defs, condense_pgrp=condense_pgrp, sparse=sparse)
+
+        if not isinstance(sln, dict):
+            from chemnetwrk3 import extract_solution
+            sln = extract_solution(sln, unconstrained_raw)
+        self.arr = {**sln,
+                'materials': np.asarray(sln['i'], dtype=object),
+                'processes': np.asarray(sln['j'], dtype=object)}
+
+    def _raw_nbytes(self):
+        # solution arrays are the only source of the case, not released
+        return onecase.deep_sizeof(self.arr)
+
+    def _frame_dict(self, key):
+        """single column dataframe from dict section (demand/supply)"""
+        df = pd.DataFrame.from_dict(self.arr[key], orient='index', columns=[key])
+        df.index.name = 'material'
+        return self._condense_1d(df)
+
+    @property
+    def df_material(self):
+        return self.arr['i']
+
+    @property
+    def df_process(self):
+        return self.arr['j']
+
+    @property
+    def df_iom(self):
+        return self._frame_2d('a', 'a')
+
+    @property
+    def df_demand(self):
+        if self._df_demand is None:
+            self._df_demand = self._frame_dict('demand')
+        return self._df_demand
+
+    @property
+    def df_supply(self):
+        if self._df_supply is None:
+            self._df_supply = self._frame_dict('supply')
+        return self._df_supply
+
+    @property
+    def df_unconstrained_raw(self):
+        if self._df_unconstrained_raw is None:
+            # not in solution unless given to extract_solution()
+            lst = self.arr.get('unconstrained_raw', [])
+            self._df_unconstrained_raw = self._condense_1d(pd.DataFrame([], index=pd.Index(lst)))
+        return self._df_unconstrained_raw
+
+    @property
+    def df_pgrp(self):
+        pass
+
+    @property
+    def df_pgrp_defs(self):
+        pass
+
+    @property
+    def df_flux(self):
+        if self._df_flux is None:
+            self._mk_flux()
+        return self._df_flux
+
+    @property
+    def df_flux_byproc(self):
+        if self._df_flux_byproc is None:
+            self._mk_flux_byproc()
+        return self._df_flux_byproc
+
+    @property
+    def df_edges(self):
+        if self._df_edges is None:
+            self._mk_edges()
+        return self._df_edges
+
+    @property
+    def df_edges_byproc(self):
+        if self._df_edges_byproc is None:
+            self._mk_edges()
+        return self._df_edges_byproc
+
+    def _mk_thru_matrix(self):
+        return self._arr_thru_matrix()
+
+    @property
+    def df_thru(self):
+        if self._df_thru is None and self.sparse:
+            self._df_thru = self.thru_matrix.to_frame()
+        if self._df_thru is None:
+            self._df_thru = self._arr_df_thru()
+        return self._df_thru
+
+    @property
+    def df_net_prod(self):
+        if self._df_net_prod is None:
+            self._df_net_prod = self._arr_df_net_prod()
+        return self._df_net_prod
+
+    @property
+    def df_gross_prod(self):
+        return self._gross('gross_prod', lambda: self._frame_1d('gross_prod'))
+
+    @property
+    def df_gross_cons(self):
+        return self._gross('gross_cons', lambda: self._frame_1d('gross_cons'))
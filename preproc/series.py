@@ -0,0 +1,354 @@
+"""align frames of series of cases on shared key axis
+
+each keyed frame (nodes, edges, (edge, process) etc) of all cases is
+placed on one integer coded key axis, and its values are held as 2-d array
+(key x case).  representative values (max, minmax) and the series payloads
+for the graph are derived from the array.  SeriesBuilder folds cases into
+these arrays one at a time and makes the graph of the series.
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from graph import mk_graph, update_meta
+import onecase
+import profiling
+
+
+def _shared_codes(indexes):
+    """codes of indexes coded on shared dictionaries (onecase.Categories)
+
+    returns (list of code arrays, one for each level, across all indexes;
+    list of dictionaries), or None when indexes are not coded that way
+    """
+    if all(isinstance(i, pd.MultiIndex) for i in indexes):
+        levels = [[i.levels[l] for i in indexes] for l in range(indexes[0].nlevels)]
+        codes = [[i.codes[l] for i in indexes] for l in range(indexes[0].nlevels)]
+    elif all(isinstance(i, pd.CategoricalIndex) for i in indexes):
+        levels = [[i.categories for i in indexes]]
+        codes = [[i.codes for i in indexes]]
+    else:
+        return None
+    # dictionaries only grow, so each has to be prefix of the longest
+    dcts = [max(lvls, key=len) for lvls in levels]
+    for dct, lvls in zip(dcts, levels):
+        if not all(l is dct or dct[:len(l)].equals(l) for l in lvls):
+            return None
+    if np.prod([float(len(_)) for _ in dcts]) >= 2.**62:
+        return None
+    return [np.concatenate(c).astype(np.int64) for c in codes], dcts
+
+
+class SeriesTensor:
+    """values of a keyed frame across cases
+
+    keys: Index/MultiIndex, union of keys of all cases, in order of appearance
+    values: 2-d array (key x case), nan where key is absent in a case
+    labels: list of case labels
+    """
+
+    def __init__(self, keys, values, labels):
+        self.keys = keys
+        self.values = values
+        self.labels = list(labels)
+
+    @classmethod
+    def from_frames(cls, frames, labels, column=None):
+        """from list of single column frames, one for each case
+
+        column: column to use, default the first column
+        """
+        frames = list(frames)
+        shared = _shared_codes([df.index for df in frames])
+        if shared is not None:
+            # lean cases, factorize on integer codes without making the names
+            lcodes, dcts = shared
+            key = np.zeros(len(lcodes[0]), dtype=np.int64)
+            for c, dct in zip(lcodes, dcts):
+                key = key * len(dct) + c
+            codes, ukey = pd.factorize(key)
+            ucodes = []
+            for dct in dcts[::-1]:
+                ucodes.insert(0, ukey % len(dct))
+                ukey = ukey // len(dct)
+            idx = frames[0].index
+            if isinstance(idx, pd.MultiIndex):
+                keys = pd.MultiIndex(levels=dcts, codes=ucodes, names=idx.names, verify_integrity=False)
+            else:
+                keys = pd.CategoricalIndex(pd.Categorical.from_codes(ucodes[0], categories=dcts[0]), name=idx.name)
+        else:
+            allkeys = frames[0].index.append([df.index for df in frames[1:]])
+            codes, keys = allkeys.factorize()
+            if isinstance(keys, pd.MultiIndex):
+                keys.names = frames[0].index.names
+            else:
+                keys.name = frames[0].index.name
+        icase = np.repeat(np.arange(len(frames)), [len(df.index) for df in frames])
+        vals = np.concatenate([
+            (df[column] if column is not None else df.iloc[:, 0]).to_numpy(dtype=float)
+            for df in frames])
+        values = np.full((len(keys), len(frames)), np.nan)
+        values[codes, icase] = vals
+        return cls(keys, values, labels)
+
+    def extend(self, frames, labels, column=None):
+        """add cases, keys not seen yet are added at the end
+
+        same result as from_frames() with the frames appended to the list.
+        values are copied once for all the frames, so add cases in batches
+        rather than one at a time
+        """
+        new = SeriesTensor.from_frames(frames, labels, column)
+        pos = self.keys.get_indexer(new.keys)
+        unseen = pos < 0
+        nkey, ncase = self.values.shape
+        if unseen.any():
+            pos[unseen] = np.arange(nkey, nkey + unseen.sum())
+            self.keys = self.keys.append(new.keys[unseen])
+        values = np.full((len(self.keys), ncase + len(new.labels)), np.nan)
+        values[:nkey, :ncase] = self.values
+        values[pos, ncase:] = new.values
+        self.values = values
+        self.labels.extend(new.labels)
+
+    def append(self, df, label, column=None):
+        """add a case, see extend()"""
+        self.extend([df], [label], column)
+
+    def filled(self, fill=0.):
+        """values with absent keys filled"""
+        return np.where(np.isnan(self.values), fill, self.values)
+
+    def to_frame(self, fill=0.):
+        """key x case dataframe"""
+        return pd.DataFrame(self.filled(fill), index=self.keys, columns=self.labels)
+
+    def max(self, name):
+        """max across cases where key is present, as single column frame"""
+        return pd.DataFrame({name: np.nanmax(self.values, axis=1)}, index=self.keys)
+
+    def minmax(self, name):
+        """max or min across cases (whichever larger in magnitude), as single column frame"""
+        mx = np.nanmax(self.values, axis=1)
+        mn = np.nanmin(self.values, axis=1)
+        return pd.DataFrame({name: np.where(np.abs(mx) > np.abs(mn), mx, mn)}, index=self.keys)
+
+    def payload(self, name):
+        """dict of {key: {name: [value for each case]}}, absent filled with 0"""
+        return {k: {name: v} for k, v in zip(self.keys, self.filled().tolist())}
+
+    def grouped_payload(self, name):
+        """dict of {group: {name: [{last level: value} for each case]}}
+
+        group is the key without its last level (e.g. material of (material,
+        process)), absent filled with 0
+        """
+        nlev = self.keys.nlevels
+        grp = self.keys.droplevel(nlev - 1)
+        gcodes, gkeys = grp.factorize()
+        order = np.argsort(gcodes, kind='stable')
+        bounds = np.flatnonzero(np.diff(gcodes[order])) + 1
+        last = np.split(self.keys.get_level_values(nlev - 1).to_numpy(dtype=object)[order], bounds)
+        vals = np.split(self.filled()[order], bounds)
+        return {g: {name: [dict(zip(l, col)) for col in v.T.tolist()]}
+                for g, l, v in zip(gkeys, last, vals)}
+
+
+class SeriesBuilder:
+    """series of cases, added one at a time
+
+    frames of each case (edges, flux, etc) are kept until build() folds them
+    into (key x case) tensors all at once, and only values from the first
+    case (demand, supply, ...) are kept besides.  the case (OneCase) itself is
+    not kept.  cases can be added after build(), without reprocessing the
+    earlier ones.
+
+    orient_edges: net out dual edges in each case, and orient each edge as
+        it appeared first across cases
+    """
+
+    # tensor: OneCase attribute
+    frames = {
+            'edges': 'df_edges',
+            'flux': 'df_flux',
+            'edges_byproc': 'df_edges_byproc',
+            'flux_byproc': 'df_flux_byproc',
+            'gross_prod': 'df_gross_prod',
+            'gross_cons': 'df_gross_cons',
+            }
+
+    def __init__(self, orient_edges=False):
+        self.orient_edges = orient_edges
+        self.labels = []
+        self.ts = {}
+        # {tensor: [frame of each case]} not folded into ts yet
+        self.pending = {name: [] for name in self.frames}
+        self.edgelist = None
+
+        # from first case
+        self.df_pgrp = None
+        self.df_demand = None
+        self.df_supply = None
+        self.df_unconstrained_raw = None
+
+    def add(self, label, dat):
+        """add a case (OneCase object) to the series"""
+        if label in self.labels:
+            raise ValueError(f'case {label} already in series')
+
+        with profiling.span('add', case=label):
+            if self.orient_edges:
+                # orientation of edges seen so far stays, new ones take this case's
+                dat.condense_dual_edges()
+                idx = [dat.df_edges.index] if self.edgelist is None else [self.edgelist, dat.df_edges.index]
+                self.edgelist = onecase.pick_edge_orientation(idx)
+                dat.specify_edge_orientation(self.edgelist)
+
+            for name, attr in self.frames.items():
+                self.pending[name].append(getattr(dat, attr))
+
+        if not self.labels:
+            self.df_pgrp = dat.df_pgrp
+            self.df_demand = dat.df_demand
+            self.df_supply = dat.df_supply
+            self.df_unconstrained_raw = dat.df_unconstrained_raw
+        self.labels.append(label)
+
+    def fold(self):
+        """fold frames of cases added since last time into the tensors, returns the tensors"""
+        labels = self.labels[len(self.labels) - len(self.pending['edges']):]
+        if labels:
+            with profiling.span('fold'):
+                for name, frames in self.pending.items():
+                    if name in self.ts:
+                        self.ts[name].extend(frames, labels)
+                    else:
+                        self.ts[name] = SeriesTensor.from_frames(frames, labels)
+                    self.pending[name] = []
+        return self.ts
+
+    def build_frames(self):
+        """frames and payloads of cases added so far, what build() makes the graph from
+
+        output
+        dict of relevane dataframe/dicts, for QA purpose
+        """
+        ts = self.fold()
+        # sorted by key, as groupby().agg() had them, so that output stays the same
+        df_edges = ts['edges'].max('flux').sort_index()
+
+        df_flux = ts['flux'].max('flux').sort_index()
+        df_gross_prod = ts['gross_prod'].minmax('gross_prod').sort_index()
+        df_gross_cons = ts['gross_cons'].minmax('gross_cons').sort_index()
+
+        df_pgrp = self.df_pgrp
+        df_demand = self.df_demand
+
+        # deals with product group's demand (condense_pgrp is not supported)
+        # method 1, split demand across members
+        lst = []
+        if df_pgrp:
+            for r_grp in df_pgrp.itertuples():
+                members = df_flux[df_flux.index.isin(r_grp.members)]
+                assert len(members.index) > 0
+                totflux = members.flux.sum()
+                for r_mem in members.itertuples():
+                    lst.append({'material': r_mem.Index, 'demand': r_mem.flux / totflux * r_grp.pgrp_demand})
+        if lst:
+            df_demand2 = pd.concat([df_demand, pd.DataFrame(lst).set_index('material')])
+        else:
+            df_demand2 = df_demand
+
+        # add series of flux to node, flux to edges
+        with profiling.span('payload'):
+            df_series_flux = ts['flux'].to_frame()
+            df_series_flux_byproc = ts['flux_byproc'].to_frame()
+            df_series_edges = ts['edges'].to_frame()
+            df_series_edges_byproc = ts['edges_byproc'].to_frame()
+
+            dct_series_flux = ts['flux'].payload('series_flux')
+            dct_series_edges = ts['edges'].payload('series_flux')
+
+            dct_series_flux_byproc = ts['flux_byproc'].grouped_payload('series_flux_byproc')
+            dct_series_edges_byproc = ts['edges_byproc'].grouped_payload('series_flux_byproc')
+
+        # aux dataframes (and dicts)
+        return {
+                'df_edges': df_edges,
+                'df_flux': df_flux,
+                'df_gross_prod': df_gross_prod,
+                'df_gross_cons': df_gross_cons,
+                'df_supply': self.df_supply,
+                'df_demand': df_demand,
+                'df_demand2': df_demand2,
+                'df_series_flux': df_series_flux,
+                'df_series_edges': df_series_edges,
+                'df_series_edges_byproc': df_series_edges_byproc,
+                'dct_series_edges': dct_series_edges,
+                'dct_series_edges_byproc': dct_series_edges_byproc,
+                'dct_series_flux': dct_series_flux,
+                'df_series_flux_byproc': df_series_flux_byproc,
+                'dct_series_flux_byproc': dct_series_flux_byproc,
+                }
+
+    def build_graph(self, dfs, title=None, series_descs=None, use_nx=False):
+        """graph from build_frames()
+
+        output
+        g: GraphDoc or networkx digraph (many node/edge attrubutes are list spanning across cases)
+        """
+        with profiling.span('mk_graph'):
+            g = mk_graph(dfs['df_edges'], node_attrs=[
+                self.df_supply, 
+                dfs['df_demand2'], 
+                self.df_unconstrained_raw,
+                dfs['dct_series_flux'], 
+                dfs['dct_series_flux_byproc'],
+                ], edge_attrs=[ 
+                    dfs['dct_series_edges'],
+                    dfs['dct_series_edges_byproc'],
+                    ], use_nx=use_nx)
+
+        # meta data
+        if title is not None:
+            g.graph.update({'title': title})
+        g.graph.update({
+            'series_labels' : list(self.labels), 
+            })
+        if series_descs is not None:
+            g.graph.update({'series_descs': series_descs})
+        if self.orient_edges:
+            g.graph.update({'oriented': True})
+        else:
+            g.graph.update({'oriented': False})
+        inpdat = {
+                'demend': self.df_demand,
+                'supply': self.df_supply,
+                'unconstrained_raw': self.df_unconstrained_raw,
+                }
+        update_meta(g, inpdat)
+        return g
+
+    def build(self, title=None, series_descs=None, use_nx=False):
+        """graph of cases added so far
+
+        output
+        2-tuple of 
+        g: GraphDoc or networkx digraph (many node/edge attrubutes are list spanning across cases)
+        dfs:  dict of relevane dataframe/dicts, for QA purpose (build_frames())
+        """
+        dfs = self.build_frames()
+        g = self.build_graph(dfs, title=title, series_descs=series_descs, use_nx=use_nx)
+        return g, dfs
+
+    def save(self, fname):
+        """save the series (to add more cases later)"""
+        with open(fname, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, fname):
+        with open(fname, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,161 @@
+"""incremental reader for model output json (sln.json)
+
+reads the file in chunks and decodes one entry of each section at a time,
+so that the full nested dict is never built.  numeric sections are stored
+as typed arrays with integer coded material/process names.
+
+uses json's own (C) scanner for the leaf values, so that non-standard
+tokens written by json.dump (Infinity, NaN) are accepted as in json.load
+"""
+
+import json
+import json.scanner
+import re
+from array import array
+
+import numpy as np
+
+# sections of {material: {process: value}}
+SECTIONS_2D = ('throughput', 'a')
+# sections of {material: value} or {process: value}
+SECTIONS_1D = ('gross_prod', 'gross_cons', 'net_prod', 'demand', 'supply', 'x')
+# sections of [name, ...]
+SECTIONS_LIST = ('i', 'j', 'unconstrained_raw')
+
+_ws = re.compile(r'[ \t\n\r]*')
+
+
+class _Reader:
+    """pull parser over a text file, refilling buffer as needed"""
+
+    def __init__(self, f, chunksize=1<<20):
+        self.f = f
+        self.chunksize = chunksize
+        self.buf = ''
+        self.pos = 0
+        self.scan_once = json.scanner.make_scanner(json.JSONDecoder())
+
+    def _fill(self):
+        s = self.f.read(self.chunksize)
+        if not s:
+            return False
+        self.buf = self.buf[self.pos:] + s
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _ws.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f'expected {ch!r} at {self.f.name}, got {self.peek()!r}')
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        # number at end of buffer may be truncated (e.g. "1." of "1.5")
+        while len(self.buf) - self.pos < 64 and self._fill():
+            pass
+        while True:
+            try:
+                obj, end = self.scan_once(self.buf, self.pos)
+            except (StopIteration, json.JSONDecodeError):
+                if self._fill():
+                    continue
+                raise ValueError(f'malformed json in {self.f.name}')
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def items(self):
+        """iterate over key/value of an object, one entry at a time"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self
+            ch = self.peek()
+            self.pos += 1
+            if ch == '}':
+                return
+            if ch != ',':
+                raise ValueError(f'expected , or }} in {self.f.name}, got {ch!r}')
+
+    def skip(self):
+        """discard a value, object is consumed one entry at a time"""
+        if self.peek() == '{':
+            for _, rdr in self.items():
+                rdr.skip()
+        else:
+            self.value()
+
+
+class _Codes(dict):
+    """name -> integer code, in order of appearance"""
+
+    def code(self, name):
+        c = self.get(name)
+        if c is None:
+            c = self[name] = len(self)
+        return c
+
+    def names(self):
+        return np.array(list(self.keys()), dtype=object)
+
+
+def read_case(fname, sections=None):
+    """read sections of model output json into arrays
+
+    fname: path to json file
+    sections: names of sections to keep (default all known sections)
+
+    returns dict with
+    'materials', 'processes': array of names, index for the integer codes
+    2d sections ('throughput', 'a'): 3-tuple of (material code, process code, value)
+    1d sections ('demand', 'gross_prod' etc): 2-tuple of (code, value),
+        code is process code for 'x', material code otherwise
+    list sections ('i', 'j', 'unconstrained_raw'): list of names
+    """
+    if sections is None:
+        sections = SECTIONS_2D + SECTIONS_1D + SECTIONS_LIST
+    mats = _Codes()
+    procs = _Codes()
+    out = {}
+    with open(fname, 'r') as f:
+        rdr = _Reader(f)
+        for key, _ in rdr.items():
+            if key not in sections:
+                rdr.skip()
+            elif key in SECTIONS_2D:
+                rows, cols, vals = array('i'), array('i'), array('d')
+                for mat, _ in rdr.items():
+                    imat = mats.code(mat)
+                    for proc, v in rdr.value().items():
+                        rows.append(imat)
+                        cols.append(procs.code(proc))
+                        vals.append(v)
+                out[key] = (np.frombuffer(rows, dtype=np.int32),
+                        np.frombuffer(cols, dtype=np.int32),
+                        np.frombuffer(vals, dtype=float))
+            elif key in SECTIONS_1D:
+                codes = procs if key == 'x' else mats
+                rows, vals = array('i'), array('d')
+                for name, _ in rdr.items():
+                    rows.append(codes.code(name))
+                    vals.append(rdr.value())
+                out[key] = (np.frombuffer(rows, dtype=np.int32),
+                        np.frombuffer(vals, dtype=float))
+            else:
+                out[key] = rdr.value()
+    out['materials'] = mats.names()
+    out['processes'] = procs.names()
+    return out
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""synthetic chemical networks, for benchmarks
+
+network: each process consumes a few materials and produces a few
+others, always of larger index than what it consumes, so there are no
+cycles.  materials no process makes are unconstrained raw (infinite
+supply), some made materials have demand, and product groups are drawn
+from made materials.
+
+from a network, this writes
+- solution json of cases (same layout as sln.json of chemnetwrk3.py, read
+  by reader_json_v1.OneCase).  production levels are random, not solved
+- chemnetwork_model inputs as json (read_model_inputs() gives the arguments)
+
+usage: python synth.py outdir [nmat nproc ncase]
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+def _counts(n, rng, size):
+    """n (int) or (lo, hi) range, as array of counts"""
+    if np.isscalar(n):
+        return np.full(size, int(n))
+    return rng.integers(n[0], n[1] + 1, size=size)
+
+
+def _distinct_rows(nrow, width, nmax, rng):
+    """(nrow x width) array of random integers below nmax, distinct within row"""
+    out = rng.integers(0, nmax, size=(nrow, width))
+    while True:
+        s = np.sort(out, axis=1)
+        dup = (np.diff(s, axis=1) == 0).any(axis=1)
+        if not dup.any():
+            return out
+        out[dup] = rng.integers(0, nmax, size=(dup.sum(), width))
+
+
+def mk_network(nmat, nproc, ninp=3, nout=2, npgrp=10, nmember=5, demand_frac=.05, seed=0):
+    """random network
+
+    nmat, nproc: number of materials/processes
+    ninp, nout: number of inputs/outputs of each process, int or (lo, hi) range
+    npgrp, nmember: number of product groups, and members of each
+    demand_frac: fraction of made materials with demand
+
+    returns dict of arrays
+    materials, processes: names
+    imat, iproc, a: io matrix nonzeros (negative for input)
+    cost: cost of each process
+    raw: materials no process makes
+    demand: (imat, value)
+    pgrp: group names, pgrp_i: (igrp, imat), pgrp_demand: for each group
+    """
+    rng = np.random.default_rng(seed)
+    kin = _counts(ninp, rng, nproc)
+    kout = _counts(nout, rng, nproc)
+    ktot = kin + kout
+    width = ktot.max()
+    if width > nmat:
+        raise ValueError('more inputs/outputs than materials')
+
+    # materials of each process, sorted so that inputs come before outputs
+    mats = _distinct_rows(nproc, width, nmat, rng)
+    used = np.arange(width)[None, :] < ktot[:, None]
+    mats = np.sort(np.where(used, mats, nmat), axis=1)
+    is_inp = np.arange(width)[None, :] < kin[:, None]
+
+    imat = mats[used]
+    iproc = np.repeat(np.arange(nproc), ktot)
+    inp = is_inp[used]
+    a = np.where(inp, -rng.uniform(.1, 2., size=len(imat)), rng.uniform(.1, 1., size=len(imat)))
+
+    made = np.unique(imat[~inp])
+    raw = np.setdiff1d(np.arange(nmat), made)
+    idem = rng.choice(made, size=max(1, int(len(made) * demand_frac)), replace=False)
+    npgrp = npgrp if len(made) >= nmember else 0
+    pgrp_i = (np.repeat(np.arange(npgrp), nmember),
+            np.concatenate([rng.choice(made, size=nmember, replace=False) for _ in range(npgrp)] or [np.zeros(0, int)]))
+
+    return {
+            'materials': np.array([f'M{_}' for _ in range(nmat)], dtype=object),
+            'processes': np.array([f'P{_}' for _ in range(nproc)], dtype=object),
+            'imat': imat,
+            'iproc': iproc,
+            'a': a,
+            'cost': rng.uniform(1., 10., size=nproc),
+            'raw': raw,
+            'demand': (idem, rng.uniform(1., 10., size=len(idem))),
+            'pgrp': np.array([f'G{_}' for _ in range(npgrp)], dtype=object),
+            'pgrp_i': pgrp_i,
+            'pgrp_demand': rng.uniform(1., 10., size=npgrp),
+            }
+
+
+def model_inputs(net):
+    """arguments of chemnetwork_model() for the network"""
+    mats = net['materials']
+    procs = net['processes']
+    idem, dem = net['demand']
+    igrp, imem = net['pgrp_i']
+    return {
+            'j': procs.tolist(),
+            'i': mats.tolist(),
+            'a': dict(zip(zip(mats[net['imat']].tolist(), procs[net['iproc']].tolist()), net['a'].tolist())),
+            'cost': dict(zip(procs.tolist(), net['cost'].tolist())),
+            'demand': dict(zip(mats[idem].tolist(), dem.tolist())),
+            'supply': {_: float('inf') for _ in mats[net['raw']].tolist()},
+            'product_group': net['pgrp'].tolist(),
+            'product_group_i': list(zip(net['pgrp'][igrp].tolist(), mats[imem].tolist())),
+            'product_group_demand': dict(zip(net['pgrp'].tolist(), net['pgrp_demand'].tolist())),
+            }
+
+
+def write_model_inputs(net, fname):
+    """save chemnetwork_model inputs as json, tuple keys as lists"""
+    inp = model_inputs(net)
+    inp['a'] = [[i, j, v] for (i, j), v in inp['a'].items()]
+    inp['product_group_i'] = [list(_) for _ in inp['product_group_i']]
+    with open(fname, 'w') as f:
+        json.dump(inp, f)
+
+
+def read_model_inputs(fname):
+    """chemnetwork_model() arguments from write_model_inputs() file"""
+    with open(fname) as f:
+        inp = json.load(f)
+    inp['a'] = {(i, j): v for i, j, v in inp['a']}
+    inp['product_group_i'] = [tuple(_) for _ in inp['product_group_i']]
+    return inp
+
+
+def mk_solution(net, active=.7, spread=.3, seed=0):
+    """solution of a case, random production levels
+
+    active: fraction of processes running
+    spread: log-normal spread of production levels
+
+    returns dict in sln.json layout
+    """
+    rng = np.random.default_rng(seed)
+    mats = net['materials']
+    procs = net['processes']
+    nmat, nproc = len(mats), len(procs)
+    x = np.where(rng.random(nproc) < active, np.exp(rng.normal(0., spread, size=nproc)) * 10., 0.)
+
+    imat, iproc, a = net['imat'], net['iproc'], net['a']
+    thru = a * x[iproc]
+    net_prod = np.bincount(imat, weights=thru, minlength=nmat)
+    gross_prod = np.bincount(imat, weights=np.maximum(thru, 0), minlength=nmat)
+    gross_cons = np.bincount(imat, weights=np.minimum(thru, 0), minlength=nmat)
+
+    def nested(keep, vals):
+        dct = {}
+        for i, j, v in zip(mats[imat[keep]].tolist(), procs[iproc[keep]].tolist(), vals[keep].tolist()):
+            dct.setdefault(i, {})[j] = v
+        return dct
+
+    def nonzero(v):
+        k = np.flatnonzero(v)
+        return dict(zip(mats[k].tolist(), v[k].tolist()))
+
+    # nested dicts ordered by material, as chemnetwrk3 writes them
+    order = np.lexsort((iproc, imat))
+    imat, iproc, a, thru = imat[order], iproc[order], a[order], thru[order]
+    idem, dem = net['demand']
+    jx = np.flatnonzero(x)
+    return {
+            'i': mats.tolist(),
+            'j': procs.tolist(),
+            'demand': dict(zip(mats[idem].tolist(), dem.tolist())),
+            'supply': {_: float('inf') for _ in mats[net['raw']].tolist()},
+            'unconstrained_raw': mats[net['raw']].tolist(),
+            'a': nested(np.ones(len(a), dtype=bool), a),
+            'x': dict(zip(procs[jx].tolist(), x[jx].tolist())),
+            'throughput': nested(thru != 0, thru),
+            'net_prod': nonzero(net_prod),
+            'gross_prod': nonzero(gross_prod),
+            'gross_cons': nonzero(gross_cons),
+            }
+
+
+def write_cases(outdir, nmat=1000, nproc=2000, ncase=3, seed=0, **kwds):
+    """write model inputs and solution json of cases
+
+    kwds: passed to mk_network()
+
+    returns (list of dict with 'id' and 'path', as load_cases() takes; path of model inputs)
+    """
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    net = mk_network(nmat, nproc, seed=seed, **kwds)
+    minp = outdir / 'model_inputs.json'
+    write_model_inputs(net, minp)
+    cases = []
+    for k in range(ncase):
+        path = outdir / f'case{k}.json'
+        with open(path, 'w') as f:
+            json.dump(mk_solution(net, seed=seed + k + 1), f)
+        cases.append({'id': f'case{k}', 'path': str(path)})
+    return cases, minp
+
+
+if __name__ == '__main__':
+    outdir = sys.argv[1]
+    args = [int(_) for _ in sys.argv[2:5]]
+    cases, minp = write_cases(outdir, *args)
+    for c in cases:
+        print(c['path'])
+    print(minp)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from onecase import pair_by_group, CONDENSE_TOL
+
+class ThruMatrix:
+    """throughput as sparse material x process matrix
+
+    mat: scipy.sparse csc_matrix, shape (len(materials), len(processes))
+    materials: pd.Index, row lookup
+    processes: pd.Index, column lookup
+    """
+
+    def __init__(self, mat, materials, processes):
+        self.mat = sp.csc_matrix(mat)
+        self.mat.eliminate_zeros()
+        self.materials = pd.Index(materials, name='material')
+        self.processes = pd.Index(processes, name='process')
+
+    @classmethod
+    def from_arrays(cls, material, process, thru):
+        """from parallel arrays of material name, process name and throughput"""
+        imat, materials = pd.factorize(pd.Index(material))
+        iproc, processes = pd.factorize(pd.Index(process))
+        mat = sp.coo_matrix((np.asarray(thru, dtype=float), (imat, iproc)),
+                shape=(len(materials), len(processes)))
+        return cls(mat, materials, processes)
+
+    @classmethod
+    def from_dict(cls, dct):
+        """from dict of {material: {process: thru}}"""
+        material = [m for m, v in dct.items() for _ in v]
+        process = [p for v in dct.values() for p in v]
+        thru = np.fromiter((vv for v in dct.values() for vv in v.values()),
+                dtype=float, count=len(process))
+        return cls.from_arrays(material, process, thru)
+
+    @classmethod
+    def from_frame(cls, df_thru):
+        """from df_thru, MultiIndex of material/process"""
+        return cls.from_arrays(
+                df_thru.index.get_level_values('material'),
+                df_thru.index.get_level_values('process'),
+                df_thru['thru'].to_numpy())
+
+    def to_frame(self, name='thru'):
+        """dataframe in df_thru layout, rows grouped by material"""
+        coo = self.mat.tocsr().tocoo()
+        idx = pd.MultiIndex.from_arrays(
+                [self.materials[coo.row], self.processes[coo.col]],
+                names=['material', 'process'])
+        return pd.DataFrame({name: coo.data}, index=idx)
+
+    def condense(self, mapping):
+        """materials remapped to groups, summed for each process
+
+        mapping: pd.Series of {material: group}, materials not in it stay as is
+
+        flows between members of a group in a process net out, and are
+        dropped when they balance
+        """
+        grp = self.materials.map(mapping)
+        names = np.where(pd.isna(grp), self.materials.to_numpy(dtype=object), grp.to_numpy(dtype=object))
+        code, groups = pd.factorize(names)
+        coo = self.mat.tocoo()
+        nproc = len(self.processes)
+        ikey, ukey = pd.factorize(code[coo.row].astype(np.int64) * nproc + coo.col)
+        v = np.bincount(ikey, weights=coo.data, minlength=len(ukey))
+        gross = np.bincount(ikey, weights=np.abs(coo.data), minlength=len(ukey))
+        keep = np.abs(v) > CONDENSE_TOL * gross
+        mat = sp.coo_matrix((v[keep], (ukey[keep] // nproc, ukey[keep] % nproc)),
+                shape=(len(groups), nproc))
+        return ThruMatrix(mat, groups, self.processes)
+
+    @property
+    def cons(self):
+        """consumption part (negative values) of the matrix"""
+        m = self.mat.minimum(0).tocsc()
+        m.eliminate_zeros()
+        return m
+
+    @property
+    def prod(self):
+        """production part (positive values) of the matrix"""
+        m = self.mat.maximum(0).tocsc()
+        m.eliminate_zeros()
+        return m
+
+    def gross_cons(self):
+        """gross consumption of each material, as array"""
+        return np.asarray(self.cons.sum(axis=1)).ravel()
+
+    def gross_prod(self):
+        """gross production of each material, as array"""
+        return np.asarray(self.prod.sum(axis=1)).ravel()
+
+    def flux(self):
+        """max of gross consumption/production of each material, as array"""
+        return np.maximum(-self.gross_cons(), self.gross_prod())
+
+    def edges(self):
+        """material x material matrix of flux allocated from consumed to produced material
+
+        E = C diag(1/totc) P^T, summed over all processes
+        """
+        cons = self.cons
+        prod = self.prod
+        totc = np.asarray(cons.sum(axis=0)).ravel()
+        scl = np.divide(1., totc, out=np.zeros_like(totc), where=totc != 0)
+        return (cons @ sp.diags(scl) @ prod.T).tocoo()
+
+    def edges_byproc(self):
+        """flux allocated from consumed to produced material, for each process
+
+        returns 4-tuple of arrays, (material0, material1, process) codes and flux
+        """
+        cons = self.cons
+        prod = self.prod
+        totc = np.asarray(cons.sum(axis=0)).ravel()
+        nproc = len(self.processes)
+        grp_c = np.repeat(np.arange(nproc), np.diff(cons.indptr))
+        grp_p = np.repeat(np.arange(nproc), np.diff(prod.indptr))
+        kc, kp = pair_by_group(grp_c, grp_p, nproc)
+        proc = grp_c[kc]
+        v = cons.data[kc] * prod.data[kp] / totc[proc]
+        return cons.indices[kc], prod.indices[kp], proc, v
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""benchmark construction of chemnetwork_model on a synthetic network
+
+compares the sparse constraint generation with the original dense rules
+(sum over all processes for each material)
+
+usage: python bench_model.py [nmat nproc [--no-dense]]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pyomo.environ as pyo
+from pyomo.repn import generate_standard_repn
+
+from chemnetwrk3 import chemnetwork_model
+
+# synthetic network generator is shared with the preproc benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'preproc'))
+import synth
+
+
+def dense_model(j, i, a, cost, demand, supply, product_group=None, product_group_i=None, product_group_demand=None):
+    """original construction, kept for reference (pgrp_i declared as subset, as in chemnetwork_model)"""
+    m = pyo.ConcreteModel()
+    m.j = pyo.Set(initialize=j)
+    m.i = pyo.Set(initialize=i)
+    m.x = pyo.Var(m.j, within=pyo.NonNegativeReals)
+    m.a = pyo.Param(m.i, m.j, initialize=a, default=0)
+    m.cost = pyo.Param(m.j, initialize=cost)
+    m.demand = pyo.Param(m.i, initialize=demand, default=0)
+    m.supply = pyo.Param(m.i, initialize=supply, default=0)
+    m.pgrp = pyo.Set(initialize=product_group)
+    m.pgrp_i = pyo.Set(within=m.pgrp * m.i, initialize=product_group_i)
+    m.pgrp_demand = pyo.Param(m.pgrp, initialize=product_group_demand)
+    m.cst_obj = pyo.Objective(expr=sum(m.cost[j] * m.x[j] for j in m.j), sense=pyo.minimize)
+
+    def mb_rule(m, i):
+        return sum(m.a[i,j] * m.x[j] for j in m.j) >= m.demand[i] - m.supply[i]
+    m.mb_con = pyo.Constraint(m.i, rule=mb_rule)
+
+    def pgrp_rule(m, pgrp):
+        return sum(
+                sum(m.a[i,j] * m.x[j] for j in m.j)
+                for i in m.i if (pgrp,i) in m.pgrp_i) >= m.pgrp_demand[pgrp]
+    m.pgrp_con = pyo.Constraint(m.pgrp, rule=pgrp_rule)
+    return m
+
+
+def coefs(con):
+    """{variable name: coefficient} of nonzero terms of a constraint body"""
+    repn = generate_standard_repn(con.body)
+    dct = {}
+    for v, c in zip(repn.linear_vars, repn.linear_coefs):
+        dct[v.name] = dct.get(v.name, 0.) + c
+    return {k: c for k, c in dct.items() if c != 0}
+
+
+def main(nmat=1000, nproc=2000, dense=True):
+    inp = synth.model_inputs(synth.mk_network(nmat, nproc))
+    print(f'materials={nmat} processes={nproc} nnz={len(inp["a"])}')
+
+    t0 = time.perf_counter()
+    m = chemnetwork_model(**inp)
+    t1 = time.perf_counter()
+    print(f'sparse: {t1-t0:8.3f} s')
+
+    if not dense:
+        return
+    md = dense_model(**inp)
+    t2 = time.perf_counter()
+    print(f'dense:  {t2-t1:8.3f} s  ({(t2-t1)/(t1-t0):.0f}x)')
+
+    # same constraints, up to materials without any process
+    for name in ('mb_con', 'pgrp_con'):
+        con, cond = getattr(m, name), getattr(md, name)
+        for k in cond:
+            if k in con:
+                c, cd = coefs(con[k]), coefs(cond[k])
+                assert c.keys() == cd.keys() and all(np.isclose(c[_], cd[_]) for _ in c), (name, k)
+                assert pyo.value(con[k].lower) == pyo.value(cond[k].lower), (name, k)
+            else:
+                assert not coefs(cond[k]), (name, k)
+
+
+if __name__ == '__main__':
+    args = [_ for _ in sys.argv[1:] if not _.startswith('--')]
+    main(*[int(_) for _ in args[:2]], dense='--no-dense' not in sys.argv)
@@ -1,15 +1,56 @@
 import pyomo.environ as pyo
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 import json
 
+from workbook import read_workbook
+
 def df_to_dict(df):
     return df.set_index(df.columns[:-1].tolist()).to_dict()[df.columns[-1]]
 def df_to_list(df):
     #return df.iloc[:, 0].tolist()
     return df.set_index(df.columns.tolist()).index.tolist()
 
-def chemnetwork_model(j, i, a, cost, demand, supply, product_group=None, product_group_i=None, product_group_demand=None):
+def df_to_dict_of_dict(df):
+    # works only when two levels in multiindex, and one column for the table
+    # table header will be dropped, scalar for dict value
+
+    dct = {}
+    for (l1, l2), val in df.to_dict(orient='index').items():
+        dct.setdefault(l1, {})[l2] = next(iter(val.values()))
+    return dct
+
+def io_columns(a, j=None):
+    """nonzeros of io matrix for each material
+
+    a: dict of {(i, j): a}
+    j: processes to keep (default all)
+
+    returns dict of {i: [(j, a), ...]}
+    """
+    if j is not None:
+        j = set(j)
+    cols = {}
+    for (ii, jj), v in a.items():
+        if v != 0 and (j is None or jj in j):
+            cols.setdefault(ii, []).append((jj, v))
+    return cols
+
+def chemnetwork_model(j, i, a, cost, demand, supply, product_group=None, product_group_i=None, product_group_demand=None, mutable=False):
+    """build the model
+
+    mutable: make cost, demand, supply and product group demand mutable Params,
+             so that the model can be re-solved with new values (see sweep.py).
+             constraints of materials no process touches are skipped then
+    """
+
+    # nonzeros of io matrix, by material, and members of product group
+    # constraints are built from these, so that model size scales with nnz of io matrix
+    cols = io_columns(a, j)
+    members = {}
+    for g, ii in (product_group_i or []):
+        members.setdefault(g, []).append(ii)
 
     # the model
     m = pyo.ConcreteModel()
@@ -25,179 +66,239 @@ def chemnetwork_model(j, i, a, cost, demand, supply, product_group=None, product
     m.a = pyo.Param(m.i, m.j, doc='IO matrix', initialize=a, default=0)
 
     # process cost
-    m.cost = pyo.Param(m.j, doc='Process cost', initialize=cost)
+    m.cost = pyo.Param(m.j, doc='Process cost', initialize=cost, mutable=mutable)
 
     # material supply/demand
-    m.demand = pyo.Param(m.i, doc='Demand', initialize=demand, default=0)
-    m.supply = pyo.Param(m.i, doc='Supply', initialize=supply, default=0)
+    m.demand = pyo.Param(m.i, doc='Demand', initialize=demand, default=0, mutable=mutable)
+    m.supply = pyo.Param(m.i, doc='Supply', initialize=supply, default=0, mutable=mutable)
 
     # product group for grouped demand
     m.pgrp = pyo.Set(doc='Product group', initialize=product_group)
-    m.pgrp_i = pyo.Set(m.pgrp * m.i, doc='Product group member materials', initialize=product_group_i)
-    m.pgrp_demand = pyo.Param(m.pgrp, doc='Product group demand', initialize=product_group_demand)
+    m.pgrp_i = pyo.Set(within=m.pgrp * m.i, doc='Product group member materials', initialize=product_group_i)
+    m.pgrp_demand = pyo.Param(m.pgrp, doc='Product group demand', initialize=product_group_demand, mutable=mutable)
 
     # objectiove (sum of cost * x across j)
     m.cst_obj = pyo.Objective(expr=sum(m.cost[j] * m.x[j] for j in m.j), sense=pyo.minimize)
 
+    def _lhs(m, lst):
+        # sum of a * x over nonzeros
+        return pyo.quicksum(v * m.x[j] for j, v in lst)
+
+    def _trivial(rhs):
+        # no process touches the material(s)
+        if mutable:
+            return pyo.Constraint.Skip
+        return pyo.Constraint.Feasible if pyo.value(rhs) <= 0 else pyo.Constraint.Infeasible
+
     # mass balance constraint
     def mb_rule(m, i):
-        return sum(m.a[i,j] * m.x[j] for j in m.j) >= m.demand[i] - m.supply[i]
+        rhs = m.demand[i] - m.supply[i]
+        if i not in cols:
+            return _trivial(rhs)
+        return _lhs(m, cols[i]) >= rhs
 
     m.mb_con = pyo.Constraint(m.i, rule=mb_rule)
 
     # product group demand constraint
     def pgrp_rule(m, pgrp):
-        return sum(
-                sum(m.a[i,j] * m.x[j] for j in m.j) 
-                for i in m.i if (pgrp,i) in m.pgrp_i) >= m.pgrp_demand[pgrp]
+        lst = [_ for i in members.get(pgrp, []) for _ in cols.get(i, [])]
+        if not lst:
+            return _trivial(m.pgrp_demand[pgrp])
+        return _lhs(m, lst) >= m.pgrp_demand[pgrp]
     m.pgrp_con = pyo.Constraint(m.pgrp, rule=pgrp_rule)
 
 
     return m
 
-# 1. read from excel file
-inpfile = 'cthru_summer2022_v8.xlsm'
-
-# process and material
-j = pd.read_excel(inpfile, sheet_name='XtoG', usecols="A", names=['j']).dropna()
-i = pd.read_excel(inpfile, sheet_name='XtoG', usecols="C", names=['i']).dropna()
-
-# io matrix
-a = pd.read_excel(inpfile, sheet_name='XtoG', usecols="E:G", names=['i','j', 'a']).dropna()
-
-# cost
-cost = pd.read_excel(inpfile, sheet_name='XtoG', usecols="I:J", names=['j', 'cost']).dropna()
-
-# supply/demand
-demand = pd.read_excel(inpfile, sheet_name='XtoG', usecols="L:M", names=['i', 'demand']).dropna()
-supply = pd.read_excel(inpfile, sheet_name='XtoG', usecols="O:P", names=['i', 'supply']).dropna()
-primary_raw = pd.read_excel(inpfile, sheet_name='XtoG', usecols="O").dropna()
-unconstrained_raw = pd.read_excel(inpfile, sheet_name='XtoG', usecols="R", names=['i']).dropna()
-utility = pd.read_excel(inpfile, sheet_name='XtoG', usecols="T", names=['i']).dropna()
-
-# product group
-pgrp = pd.read_excel(inpfile, sheet_name='XtoG', usecols="AL", names=['pgrp']).dropna()
-pgrp_i = pd.read_excel(inpfile, sheet_name='XtoG', usecols="AI:AJ", names=['pgrp', 'i']).dropna()
-pgrp_demand = pd.read_excel(inpfile, sheet_name='XtoG', usecols="AL:AM", names=['pgrp', 'demand']).dropna()
-
-
-dropped_process = pd.read_excel(inpfile, sheet_name='XtoG', usecols="AO", names=['dropped_process']).dropna()
-
-# 2. need to clean the data...
-
-
-_demand = demand.loc[demand.demand > 0, :]
-_demand = _demand.loc[_demand.i != 'VINYLCHLORIDE_ACETATECOPOLYMER', :]
-
-_pgrp_i = pgrp_i.loc[pgrp_i.i != 'PBTPELLETS_IVGTR1DOT1_', :]
-
-
-# 3. finalize model inputs
-# 3.1 process, drop user specified processes
-_j = j.loc[~ j.j.isin(dropped_process.dropped_process), :]
-_j = _j.loc[~ _j.j.isin(['P227', 'P228', 'P229']), :]
-
-
-# 3.2 supply
-_supply = pd.concat([
-    supply, 
-        pd.DataFrame({'i' : unconstrained_raw.i, 'supply': np.inf}),
-        pd.DataFrame({'i' : utility.i, 'supply': np.inf}),
-        ]
-        )
-
-_cost = cost.loc[cost.j.isin(_j.j),:]
-_cost.loc[_cost.j == 'P3001', 'cost'] = 999.
-_cost.loc[_cost.j == 'P3002', 'cost'] = 999.
-_a = a.loc[(a.i.isin(i.i) & a.j.isin(_j.j)), :]
-
-#_demand['demand'] = _demand.demand * .1
-#_demand['demand'] = 0.
-
-# instantiate model
-m = chemnetwork_model(
-        j=df_to_list(_j), 
-        i=df_to_list(i), 
-        a=df_to_dict(_a), 
-        cost=df_to_dict(_cost),
-        supply=df_to_dict(_supply),
-        demand=df_to_dict(_demand),
-        product_group = df_to_list(pgrp),
-        product_group_i = df_to_list(_pgrp_i), 
-        product_group_demand = df_to_dict(pgrp_demand)
-        )
-
-solver = pyo.SolverFactory('cplex')
-solver.options[ 'logfile'] = 'cplex_log.txt'  # Set the log file path
-
-results = solver.solve(m)
-
-# Print the results
-print("Solver Status:", results.solver.status)
-print("Termination Condition:", results.solver.termination_condition)
-
-if results.solver.termination_condition == pyo.TerminationCondition.optimal:
-    print("Optimal Solution Found")
-    #for j in m.j:
-    #    try:
-    #        print(f"Optimal Value of x[{j}]:", pyo.value(m.x[j]))
-    #    except ValueError as e:
-    #        print(e)
-
-else:
-    print("Solver Failed to Find an Optimal Solution")
-
-solution = {}
-
-
-a  = {k:v for k,v in m.a.items() if v != 0}
-df_a = pd.DataFrame.from_dict(a, orient='index', columns=['a'])
-df_a.index = pd.MultiIndex.from_tuples(df_a.index, names=['material', 'process'])
-
-
-x = {k:v.value for k,v in m.x.items()}
-df_x = pd.DataFrame.from_dict(x, orient='index', columns=['x'])
-df_x = df_x.loc[df_x.x != 0, :]
-df_x.index.name = 'process'
-
-df_ax = df_a.join(df_x)
-df_ax = df_ax.loc[~df_ax.x.isnull(), :].reset_index().assign(
-        net_prod = lambda df: df.a * df.x,
-        gross_prod = lambda df: (df.a+df.a.abs()) * .5 * df.x,
-        gross_cons = lambda df: (df.a-df.a.abs()) * .5 * df.x,
-        )
-
-df_throughput = df_ax.loc[:, ['material', 'process', 'net_prod']].rename(columns={'net_prod': 'throughput'})
-df_net_prod = df_ax.loc[:, ['material', 'process', 'net_prod']].groupby('material')['net_prod'].sum().to_frame()
-df_gross_prod = df_ax.loc[:, ['material', 'process', 'gross_prod']].groupby('material')['gross_prod'].sum().to_frame()
-df_gross_cons = df_ax.loc[:, ['material', 'process', 'gross_cons']].groupby('material')['gross_cons'].sum().to_frame()
-
-df_throughput = df_throughput.loc[df_throughput.throughput != 0, :].set_index(['material', 'process'])
-df_net_prod = df_net_prod.loc[df_net_prod.net_prod != 0, :]
-df_gross_prod = df_gross_prod.loc[df_gross_prod.gross_prod != 0, :]
-df_gross_cons = df_gross_cons.loc[df_gross_cons.gross_cons != 0, :]
-
-def df_to_dict_of_dict(df):
-    # works only when two levels in multiindex, and one column for the table
-    # table header will be dropped, scalar for dict value
-
-    dct = {}
-    for (l1, l2), val in df.to_dict(orient='index').items():
-        dct.setdefault(l1, {})[l2] = next(iter(val.values()))
-    return dct
-
-
-
-solution['i'] = list(m.i)
-solution['j'] = list(m.j)
-solution['demand'] = {k:v for k,v in m.demand.items() if v != 0}
-solution['supply'] = {k:v for k,v in m.supply.items() if v != 0}
-solution['a'] =  df_to_dict_of_dict(df_a)
-solution['x'] =  df_x.to_dict()['x']
-solution['throughput'] = df_to_dict_of_dict(df_throughput) 
-solution['net_prod'] = df_net_prod.to_dict()['net_prod']
-solution['gross_prod'] = df_gross_prod.to_dict()['gross_prod']
-solution['gross_cons'] = df_gross_cons.to_dict()['gross_cons']
-
-with open('sln.json', 'w') as f:
-    json.dump(solution, f, indent=2)
+def extract_solution(m, unconstrained_raw=None):
+    """solution of solved model, as arrays
+
+    x and nonzeros of io matrix are pulled from the model in bulk, and
+    throughput, net/gross production are sparse products of the two.
+    write_solution() saves it as json, read by reader_json_v1.OneCase
+
+    unconstrained_raw: list of unconstrained raw materials, included when given
+
+    returns dict of
+    i, j: list of materials, processes
+    demand, supply: dict of nonzero values
+    unconstrained_raw: list (when given)
+    a, throughput: (imat, iproc, value) arrays, nonzeros ordered by material then process
+    x: (iproc, value) arrays, nonzero x
+    net_prod, gross_prod, gross_cons: (imat, value) arrays, nonzeros ordered by material name
+    imat, iproc are positions in i, j
+    """
+    mats = list(m.i)
+    procs = list(m.j)
+
+    # io matrix, values given to Param (not the default zeros)
+    items = list(m.a.sparse_items())
+    imat = pd.Index(mats).get_indexer([k[0] for k, _ in items])
+    iproc = pd.Index(procs).get_indexer([k[1] for k, _ in items])
+    aval = np.array([v for _, v in items], dtype=float)
+
+    # nonzeros, ordered by material then process, as in m.a.items()
+    nz = aval != 0
+    imat, iproc, aval = imat[nz], iproc[nz], aval[nz]
+    order = np.lexsort((iproc, imat))
+    imat, iproc, aval = imat[order], iproc[order], aval[order]
+
+    # production level, None (not solved) becomes nan
+    xv = m.x.extract_values()
+    x = np.array([xv[_] for _ in procs], dtype=float)
+    x0 = np.where(np.isnan(x), 0., x)
+
+    amat = sp.csr_matrix((aval, (imat, iproc)), shape=(len(mats), len(procs)))
+    thru = aval * x0[iproc]
+    sums = {
+            'net_prod': amat @ x0,
+            'gross_prod': amat.maximum(0) @ x0,
+            'gross_cons': amat.minimum(0) @ x0,
+            }
+
+    solution = {}
+    solution['i'] = mats
+    solution['j'] = procs
+    solution['demand'] = {k:pyo.value(v) for k,v in m.demand.items() if pyo.value(v) != 0}
+    solution['supply'] = {k:pyo.value(v) for k,v in m.supply.items() if pyo.value(v) != 0}
+    if unconstrained_raw is not None:
+        solution['unconstrained_raw'] = list(unconstrained_raw)
+    solution['a'] = (imat, iproc, aval)
+    jx = np.flatnonzero(x != 0)
+    solution['x'] = (jx, x[jx])
+    nz = thru != 0
+    solution['throughput'] = (imat[nz], iproc[nz], thru[nz])
+    byname = np.argsort(np.array(mats, dtype=object), kind='stable')
+    for k, v in sums.items():
+        sel = byname[v[byname] != 0]
+        solution[k] = (sel, v[sel])
+    return solution
+
+def _num(v):
+    # same as json.dumps for float, faster
+    return float.__repr__(v) if v - v == 0 else json.dumps(v)
+
+def _json_1d(names, codes, vals, pad):
+    if not len(codes):
+        return '{}'
+    body = ',\n'.join(f'{pad}  {names[c]}: {_num(v)}' for c, v in zip(codes.tolist(), vals.tolist()))
+    return '{\n' + body + '\n' + pad + '}'
+
+def _write_2d(f, inames, jnames, imat, iproc, vals):
+    # nested object {material: {process: value}}, one material at a time
+    if not len(imat):
+        f.write('{}')
+        return
+    bounds = np.flatnonzero(np.diff(imat)) + 1
+    starts = np.r_[0, bounds]
+    ends = np.r_[bounds, len(imat)]
+    f.write('{')
+    for n, (b, e) in enumerate(zip(starts.tolist(), ends.tolist())):
+        f.write((',\n' if n else '\n') + f'    {inames[imat[b]]}: ')
+        f.write(_json_1d(jnames, iproc[b:e], vals[b:e], '    '))
+    f.write('\n  }')
+
+def write_solution(solution, fname):
+    """save solution from extract_solution() as json (same as json.dump(indent=2) of nested dicts)
+
+    written section by section, without making the nested dicts
+    """
+    # json strings of names, made once
+    inames = [json.dumps(_) for _ in solution['i']]
+    jnames = [json.dumps(_) for _ in solution['j']]
+    with open(fname, 'w') as f:
+        f.write('{')
+        for n, (k, v) in enumerate(solution.items()):
+            f.write((',\n' if n else '\n') + f'  {json.dumps(k)}: ')
+            if k in ('a', 'throughput'):
+                _write_2d(f, inames, jnames, *v)
+            elif k == 'x':
+                f.write(_json_1d(jnames, *v, '  '))
+            elif k in ('net_prod', 'gross_prod', 'gross_cons'):
+                f.write(_json_1d(inames, *v, '  '))
+            else:
+                f.write(json.dumps(v, indent=2).replace('\n', '\n  '))
+        f.write('\n}')
+
+if __name__ == '__main__':
+
+    # 1. read from excel file
+    inpfile = 'cthru_summer2022_v8.xlsm'
+
+    # all tables from XtoG sheet, read once (cached by hash of the workbook)
+    tables = read_workbook(inpfile)
+    j, i, a, cost = (tables[_] for _ in ('j', 'i', 'a', 'cost'))
+    demand, supply = tables['demand'], tables['supply']
+    primary_raw, unconstrained_raw, utility = (tables[_] for _ in ('primary_raw', 'unconstrained_raw', 'utility'))
+
+    # product group
+    pgrp, pgrp_i, pgrp_demand = tables['pgrp'], tables['pgrp_i'], tables['pgrp_demand']
+
+    dropped_process = tables['dropped_process']
+
+    # 2. need to clean the data...
+
+
+    _demand = demand.loc[demand.demand > 0, :]
+    _demand = _demand.loc[_demand.i != 'VINYLCHLORIDE_ACETATECOPOLYMER', :]
+
+    _pgrp_i = pgrp_i.loc[pgrp_i.i != 'PBTPELLETS_IVGTR1DOT1_', :]
+
+
+    # 3. finalize model inputs
+    # 3.1 process, drop user specified processes
+    _j = j.loc[~ j.j.isin(dropped_process.dropped_process), :]
+    _j = _j.loc[~ _j.j.isin(['P227', 'P228', 'P229']), :]
+
+
+    # 3.2 supply
+    _supply = pd.concat([
+        supply, 
+            pd.DataFrame({'i' : unconstrained_raw.i, 'supply': np.inf}),
+            pd.DataFrame({'i' : utility.i, 'supply': np.inf}),
+            ]
+            )
+
+    _cost = cost.loc[cost.j.isin(_j.j),:]
+    _cost.loc[_cost.j == 'P3001', 'cost'] = 999.
+    _cost.loc[_cost.j == 'P3002', 'cost'] = 999.
+    _a = a.loc[(a.i.isin(i.i) & a.j.isin(_j.j)), :]
+
+    #_demand['demand'] = _demand.demand * .1
+    #_demand['demand'] = 0.
+
+    # instantiate model
+    m = chemnetwork_model(
+            j=df_to_list(_j), 
+            i=df_to_list(i), 
+            a=df_to_dict(_a), 
+            cost=df_to_dict(_cost),
+            supply=df_to_dict(_supply),
+            demand=df_to_dict(_demand),
+            product_group = df_to_list(pgrp),
+            product_group_i = df_to_list(_pgrp_i), 
+            product_group_demand = df_to_dict(pgrp_demand)
+            )
+
+    solver = pyo.SolverFactory('cplex')
+    solver.options[ 'logfile'] = 'cplex_log.txt'  # Set the log file path
+
+    results = solver.solve(m)
+
+    # Print the results
+    print("Solver Status:", results.solver.status)
+    print("Termination Condition:", results.solver.termination_condition)
+
+    if results.solver.termination_condition == pyo.TerminationCondition.optimal:
+        print("Optimal Solution Found")
+        #for j in m.j:
+        #    try:
+        #        print(f"Optimal Value of x[{j}]:", pyo.value(m.x[j]))
+        #    except ValueError as e:
+        #        print(e)
+
+    else:
+        print("Solver Failed to Find an Optimal Solution")
+
+    solution = extract_solution(m)
+    write_solution(solution, 'sln.json')
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""parametric scenario sweep of chemnetwork_model
+
+the model is built once with mutable cost/demand/supply Params, and
+re-solved for each scenario after updating the Params.  persistent
+solvers (appsi_highs, default) keep the previous basis so each re-solve
+is warm started; other solvers get warmstart=True when they support it.
+
+scenarios are split into contiguous chunks over a pool of processes,
+each process builds its own model and solves its chunk in order.  each
+scenario writes solution json, same as chemnetwrk3.py writes sln.json
+(read by reader_json_v1.OneCase).
+
+a scenario is a dict:
+  {'name': '50c',                    # used for output file name
+   'cost': {j: value, ...},          # values replacing the base inputs,
+   'demand': {i: value, ...},        # keys not given keep base values
+   'supply': {i: value, ...},
+   'product_group_demand': {pgrp: value, ...}}
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pyomo.environ as pyo
+
+from chemnetwrk3 import chemnetwork_model, extract_solution, write_solution
+
+# scenario key: (model Param, default for materials without base value)
+PARAMS = {
+        'cost': ('cost', None),
+        'demand': ('demand', 0.),
+        'supply': ('supply', 0.),
+        'product_group_demand': ('pgrp_demand', None),
+        }
+
+
+def default_solver():
+    """HiGHS (through appsi, needs highspy) if available, otherwise GLPK"""
+    if pyo.SolverFactory('appsi_highs').available(exception_flag=False):
+        return 'appsi_highs'
+    return 'glpk'
+
+
+def scenario_values(inputs, scenario):
+    """{scenario key: {index: value}} for a scenario, base inputs overridden"""
+    vals = {}
+    for key, (pname, default) in PARAMS.items():
+        base = inputs.get(key) or {}
+        over = scenario.get(key, {})
+        unknown = set(over) - set(base) if default is None else set()
+        if unknown:
+            raise ValueError(f'{key} for {sorted(unknown)[:5]} not in the model')
+        vals[key] = {**base, **over}
+    return vals
+
+
+def unserved(m):
+    """materials/groups with positive demand but no process, infeasible in any case
+
+    mutable model skips these constraints, so they are checked here instead
+    """
+    out = [i for i in m.i if i not in m.mb_con and pyo.value(m.demand[i] - m.supply[i]) > 0]
+    out += [g for g in m.pgrp if g not in m.pgrp_con and pyo.value(m.pgrp_demand[g]) > 0]
+    return out
+
+
+class Sweep:
+    """model built once, re-solved for scenarios
+
+    inputs: dict of chemnetwork_model() arguments
+    solver: solver name, default from default_solver()
+    """
+
+    def __init__(self, inputs, solver=None, unconstrained_raw=None, options=None):
+        self.inputs = inputs
+        self.unconstrained_raw = unconstrained_raw
+        self.model = chemnetwork_model(**inputs, mutable=True)
+        self.solver_name = solver or default_solver()
+        self.solver = pyo.SolverFactory(self.solver_name)
+        for k, v in (options or {}).items():
+            self.solver.options[k] = v
+        self.persistent = self.solver_name.startswith('appsi_')
+        self.solved = False
+        # current values of the Params, only changed ones are set on the model
+        self.current = scenario_values(inputs, {})
+
+    def update(self, scenario):
+        """set Params of the model for a scenario"""
+        m = self.model
+        for key, vals in scenario_values(self.inputs, scenario).items():
+            pname, default = PARAMS[key]
+            cur = self.current[key]
+            par = getattr(m, pname)
+            for k in set(cur) | set(vals):
+                v = vals.get(k, default)
+                if cur.get(k, default) != v:
+                    par[k] = v
+            self.current[key] = vals
+
+    def solve(self, scenario):
+        """update and solve for a scenario
+
+        returns termination condition (string)
+        """
+        self.update(scenario)
+        m = self.model
+        if unserved(m):
+            return str(pyo.TerminationCondition.infeasible)
+        kwds = {'load_solutions': False}
+        if not self.persistent and self.solved and self.solver.warm_start_capable():
+            kwds['warmstart'] = True
+        results = self.solver.solve(m, **kwds)
+        cond = results.solver.termination_condition
+        if cond == pyo.TerminationCondition.optimal:
+            m.solutions.load_from(results)
+            self.solved = True
+        return str(cond)
+
+    def solutions(self, scenarios):
+        """solve scenarios in order
+
+        yields (name, status, solution arrays from extract_solution() or None
+        unless optimal), e.g. for reader_pyomo.OneCase without writing files
+        """
+        for scenario in scenarios:
+            status = self.solve(scenario)
+            sln = None
+            if status == str(pyo.TerminationCondition.optimal):
+                sln = extract_solution(self.model, self.unconstrained_raw)
+            yield scenario['name'], status, sln
+
+    def run(self, scenarios, outdir, pattern='sln_{name}.json'):
+        """solve scenarios in order, write solution of each optimal one
+
+        returns list of dict with 'name', 'status', 'path' (None unless optimal)
+        """
+        outdir = Path(outdir)
+        outdir.mkdir(parents=True, exist_ok=True)
+        out = []
+        for name, status, sln in self.solutions(scenarios):
+            path = None
+            if sln is not None:
+                path = outdir / pattern.format(name=name)
+                write_solution(sln, path)
+                path = str(path)
+            out.append({'name': name, 'status': status, 'path': path})
+        return out
+
+
+def _run_chunk(inputs, scenarios, outdir, kwds):
+    """worker, solve a chunk of scenarios"""
+    return Sweep(inputs, **kwds).run(scenarios, outdir)
+
+
+def run_sweep(inputs, scenarios, outdir, workers=None, **kwds):
+    """solve scenarios using pool of processes
+
+    input
+    inputs: dict of chemnetwork_model() arguments
+    scenarios: list of scenario dicts (see module doc)
+    outdir: directory for solution files
+    workers: number of processes, None for number of cpus, 1 to run in this process
+    kwds: passed to Sweep (solver, unconstrained_raw, options)
+
+    output
+    list of dict with 'name', 'status', 'path', in order of scenarios
+    """
+    names = [_['name'] for _ in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError('scenario names must be unique')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(scenarios))
+
+    if workers <= 1:
+        return Sweep(inputs, **kwds).run(scenarios, outdir)
+
+    # contiguous chunks, so that neighbouring scenarios warm start each other
+    chunks = [list(_) for _ in np.array_split(np.arange(len(scenarios)), workers)]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(_run_chunk, inputs, [scenarios[i] for i in idx], outdir, kwds)
+                for idx in chunks]
+        return [r for fut in futs for r in fut.result()]
+
+
+if __name__ == '__main__':
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'preproc'))
+    import synth
+
+    # demo on synthetic network: cost of processes scaled by price level
+    inputs = synth.model_inputs(synth.mk_network(200, 400))
+    base = inputs['cost']
+    scenarios = [{'name': f'{c}c', 'cost': {j: v * (1 + c / 100.) for j, v in list(base.items())[::2]}}
+            for c in (0, 50, 100, 200)]
+    outdir = sys.argv[1] if len(sys.argv) > 1 else 'sweep_out'
+    for r in run_sweep(inputs, scenarios, outdir, workers=2):
+        print(r)
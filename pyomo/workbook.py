@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""read model inputs from XtoG sheet of the workbook
+
+the sheet is parsed once, and each table (j, i, a, cost, ...) is sliced
+out of it by column range, same as reading each range separately with
+pd.read_excel(usecols=..., names=...).dropna().  the tables are saved to
+binary cache keyed by hash of the workbook, so that repeated runs skip
+excel entirely.
+"""
+
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+from openpyxl.utils import column_index_from_string
+
+SHEET = 'XtoG'
+CACHE_VERSION = 1
+
+# table: (column range, column names), names None to keep header of the sheet
+TABLES = {
+        'j': ('A', ['j']),
+        'i': ('C', ['i']),
+        'a': ('E:G', ['i', 'j', 'a']),
+        'cost': ('I:J', ['j', 'cost']),
+        'demand': ('L:M', ['i', 'demand']),
+        'supply': ('O:P', ['i', 'supply']),
+        'primary_raw': ('O', None),
+        'unconstrained_raw': ('R', ['i']),
+        'utility': ('T', ['i']),
+        'pgrp': ('AL', ['pgrp']),
+        'pgrp_i': ('AI:AJ', ['pgrp', 'i']),
+        'pgrp_demand': ('AL:AM', ['pgrp', 'demand']),
+        'dropped_process': ('AO', ['dropped_process']),
+        }
+
+
+def file_hash(fname, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for b in iter(lambda: f.read(chunk), b''):
+            h.update(b)
+    return h.hexdigest()
+
+
+def _col_range(rng):
+    """'E:G' to [4, 5, 6]"""
+    first, _, last = rng.partition(':')
+    i0 = column_index_from_string(first) - 1
+    i1 = column_index_from_string(last or first) - 1
+    return list(range(i0, i1 + 1))
+
+
+def slice_tables(sheet):
+    """tables from whole sheet read with header=None
+
+    first row is the header, like read_excel with default header=0
+    """
+    out = {}
+    for name, (rng, names) in TABLES.items():
+        cols = _col_range(rng)
+        df = sheet.reindex(columns=cols)
+        header = df.iloc[0].tolist()
+        df = df.iloc[1:].reset_index(drop=True).infer_objects()
+        df.columns = names if names is not None else header
+        out[name] = df.dropna()
+    return out
+
+
+def read_workbook(inpfile, cachedir='.input_cache'):
+    """tables of model inputs from the workbook
+
+    inpfile: workbook (.xlsm/.xlsx)
+    cachedir: directory of the cache, None not to use cache
+
+    returns dict of {table name: dataframe}, see TABLES
+    """
+    cache = None
+    if cachedir is not None:
+        cache = Path(cachedir) / f'{file_hash(inpfile)}_v{CACHE_VERSION}.pkl'
+        if cache.exists():
+            return pd.read_pickle(cache)
+
+    sheet = pd.read_excel(inpfile, sheet_name=SHEET, header=None)
+    tables = slice_tables(sheet)
+
+    if cache is not None:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_suffix('.tmp')
+        pd.to_pickle(tables, tmp)
+        tmp.replace(cache)
+    return tables
@@ -0,0 +1,246 @@
+// benchmark composite_graph() of the viewer against the original
+// (filter/indexOf per id) implementation, on synthetic pairs of series graphs
+//
+// usage: node bench_composite.js [nlink ...]
+//   reference is run only up to 20000 links (it is quadratic)
+
+const fs = require('fs');
+const path = require('path');
+
+// composite_graph() from the viewer source
+function extract(text, name) {
+  let a = text.indexOf('function ' + name + '(');
+  let depth = 0;
+  for (let i = text.indexOf("{", a); i < text.length; ++i) {
+    if (text[i] == '{') { ++depth; }
+    if (text[i] == '}' && --depth == 0) { return text.slice(a, i + 1); }
+  }
+}
+const viewer_src = fs.readFileSync(path.join(__dirname, 'chemnetworkviz_v23b.js'), 'utf8');
+const composite_graph = new Function(extract(viewer_src, 'composite_graph') + '\nreturn composite_graph;')();
+
+// original implementation, kept for reference
+function composite_graph_ref(data) {
+  graph = {
+    'directed': true, 
+    'multigraph': false, 
+  };
+ 
+  let g0 = data[0]['graph'], g1 = data[1]['graph'];
+  let prefix = data[2];
+  if ((prefix != 'none') && Array.isArray(prefix) && (prefix.length == 2)) {
+    prefix = prefix.map(x => x + ' '); 
+  } else {
+    prefix = ['' , '']
+  }
+
+  let len0 = g0.series_labels.length;
+  let len1 = g1.series_labels.length;
+  graph['graph'] = {
+    'series_descs' : [ 
+      ...g0.series_descs.map(x => g0.title + ', ' + x), 
+      ...g1.series_descs.map(x => g1.title + ', ' + x),
+    ],
+    'series_labels' : [ 
+      ...g0.series_labels.map(x => prefix[0] + x), 
+      ...g1.series_labels.map(x => prefix[1] + x),
+    ],
+    'title':  g0.title + ' vs. ' + g1.title ,
+    'process_desc': [ ...g0.process_desc, ...g1.process_desc.filter(x => g0.process_desc.indexOf(x) < 0)],
+    'material_desc': [ ...g0.material_desc, ...g1.material_desc.filter(x => g0.material_desc.indexOf(x) < 0)],
+    'oriented': g0.oriented && g1.oriented,
+    'composite': true,
+  };
+
+  let oriented = graph['graph'].oriented
+
+  let ns0 = data[0]['nodes'], ns1 = data[1]['nodes'];
+  let nids = ns0.map( x => x.id);
+  nids = nids.concat(ns1.map( x => x.id).filter(x => nids.indexOf(x) < 0));
+  let nodes = [];
+
+  // nodes
+  for (let i=0, nid, n0, n1; i<nids.length; ++i) {
+    nid = nids[i];
+    n0 = ns0.filter(x => x.id == nid );
+    n1 = ns1.filter(x => x.id == nid );
+
+    if (n0.length == 0 && n1.length == 1) {
+      n0 = structuredClone(n1[0]);
+      n0['series_flux'] = Array(len0).fill(0);
+      n0['series_flux_byproc'] = Array(len0).fill(0).map(x => new Object());
+      n1 = n1[0];
+    } else if (n0.length == 1 && n1.length == 0) {
+      n1 = structuredClone(n0[0]);
+      n1['series_flux'] = Array(len1).fill(0);
+      n1['series_flux_byproc'] = Array(len1).fill(0).map(x => new Object());
+      n0 = n0[0];
+    } else {
+      n0 = n0[0];
+      n1 = n1[0];
+    }
+
+    nodes[i] = n0;
+    nodes[i]['series_flux'] = [...n0.series_flux, ...n1.series_flux];
+    nodes[i]['series_flux_byproc'] = [...n0.series_flux_byproc, ...n1.series_flux_byproc];
+  }
+  graph['nodes'] = nodes;
+
+  // links
+  let ls0 = data[0]['links'], ls1 = data[1]['links']; 
+  ls0.forEach(x => {x.id = x.source + ':' + x.target});
+  ls1.forEach(x => {x.id = x.source + ':' + x.target});
+  let lids = ls0.map( x => x.id);
+  lids = lids.concat(ls1.map( x => x.id).filter(x => lids.indexOf(x) < 0));
+  let links = [];
+
+  for (let i=0, lid, l0, l1; i<lids.length; ++i) {
+    lid = lids[i];
+    l0 = ls0.filter(x => x.id == lid);
+    l1 = ls1.filter(x => x.id == lid);
+    [src, tgt] = lid.split(':');
+
+    if (l0.length == 0 && l1.length == 1) {
+      l0 = structuredClone(l1[0]);
+      l0['series_flux'] = Array(len0).fill(0);
+      l0['series_flux_byproc'] = Array(len0).fill(0).map(x => new Object());
+      l1 = l1[0];
+    } else if (l0.length == 1 && l1.length == 0) {
+      l1 = structuredClone(l0[0]);
+      l1['series_flux'] = Array(len1).fill(0);
+      l1['series_flux_byproc'] = Array(len1).fill(0).map(x => new Object());
+      l0 = l0[0];
+    } else {
+      l0 = l0[0]
+      l1 = l1[0]
+    }
+
+    links[i] = {
+      'source': l0.source,
+      'target': l0.target,
+      'flux': l0['flux'],
+    };
+    links[i] = l0;
+    links[i]['series_flux'] = [...l0.series_flux, ...l1.series_flux];
+    links[i]['series_flux_byproc'] = [...l0.series_flux_byproc, ...l1.series_flux_byproc];
+
+
+  }
+  if (oriented) {
+    // TODO flip edge if needed
+
+    // find dual edges
+    let dups = new Map();
+    let ulinks = links.map( x => x.source < x.target ? x.source+':'+x.target : x.target+':'+x.source);
+    links.map( x => {
+      lid = x.source < x.target ? x.source+':'+x.target : x.target+':'+x.source;
+      dups.set(lid, (dups.get(lid) === undefined ? 0 : dups.get(lid)) + 1);
+    } );
+    
+    dups = [...dups.keys()].filter(x => (dups.get(x) > 1));
+
+    // merge dual edges
+    for (let i = 0, dup, lid0, lid1, link0, link1, merged, dropped; i < dups.length; ++i) {
+      dup = dups[i];
+      lid0 = dup.split(':')[0];
+      lid1 = dup.split(':')[1];
+      link0 = links.filter( x => (x.source == lid0) && (x.target == lid1 ) );
+      link0 = link0[0];
+      link1 = links.filter( x => (x.source == lid1) && (x.target == lid0 ) );
+      link1 = link1[0];
+      links.splice(links.indexOf(link0), 1);
+      links.splice(links.indexOf(link1), 1);
+
+      if (link0.flux > link1.flux) {
+        merged = link0;
+        dropped = link1;
+      } else {
+        merged = link1;
+        dropped = link0;
+      }
+      for (let j=0, proc; j < merged.series_flux.length; ++j) {
+        merged.series_flux[j] = merged.series_flux[j] - dropped.series_flux[j];
+        for (const proc in dropped.series_flux_byproc[j]) {
+          merged.series_flux_byproc[j][proc] = ((proc in merged.series_flux_byproc[j]) ? merged.series_flux_byproc[j] : 0) - dropped.series_flux_byproc[j][proc];
+        }
+
+      }
+
+      links.push(merged);
+
+    }
+    
+  }
+
+  graph['links'] = links;
+
+    
+  return graph;
+}
+
+// random number generator, so that runs are repeatable
+function rng(seed) {
+  return () => { seed = (seed * 16807) % 2147483647; return seed / 2147483647; };
+}
+
+// series graph of nlink links among nlink/2 nodes, both directions of some links
+function mk_graph(nlink, ncase, title, seed) {
+  let rand = rng(seed);
+  let nnode = Math.max(2, Math.floor(nlink / 2));
+  let ids = new Set();
+  let links = [];
+  while (links.length < nlink) {
+    let s = Math.floor(rand() * nnode), t = Math.floor(rand() * nnode);
+    if (s == t || ids.has(s + ':' + t)) { continue; }
+    ids.add(s + ':' + t);
+    let series = Array(ncase).fill(0).map(() => rand() * 10);
+    links.push({
+      'source': 'M' + s, 'target': 'M' + t,
+      'flux': Math.max(...series), 'series_flux': series,
+      'series_flux_byproc': series.map(v => ({['P' + s]: v})),
+    });
+  }
+  let nodes = Array(nnode).fill(0).map((x, i) => {
+    let series = Array(ncase).fill(0).map(() => rand() * 10);
+    return {'id': 'M' + i, 'flux': Math.max(...series), 'series_flux': series,
+      'series_flux_byproc': series.map(v => ({['P' + i]: v}))};
+  });
+  return {
+    'directed': true, 'multigraph': false,
+    'graph': {'title': title, 'series_labels': Array(ncase).fill(0).map((x, i) => 'c' + i),
+      'series_descs': Array(ncase).fill(0).map((x, i) => 'case ' + i),
+      'process_desc': [], 'material_desc': [], 'oriented': true},
+    'nodes': nodes, 'links': links,
+  };
+}
+
+function time(fn, data) {
+  data = structuredClone(data);
+  let t0 = process.hrtime.bigint();
+  let out = fn(data);
+  return [out, Number(process.hrtime.bigint() - t0) / 1e9];
+}
+
+// same nodes/links, in same order, with same series_flux
+function check(a, b) {
+  let key = x => JSON.stringify([x.id, x.source, x.target, x.series_flux]);
+  for (const k of ['nodes', 'links']) {
+    if (a[k].length != b[k].length || a[k].some((x, i) => key(x) != key(b[k][i]))) {
+      throw new Error(k + ' differ from reference');
+    }
+  }
+}
+
+let sizes = process.argv.slice(2).map(Number);
+if (sizes.length == 0) { sizes = [1000, 5000, 20000, 200000]; }
+for (const nlink of sizes) {
+  let data = [mk_graph(nlink, 3, 'A', 1), mk_graph(nlink, 2, 'B', 2), 'none'];
+  let [out, t] = time(composite_graph, data);
+  let line = `links=${nlink} merged links=${out.links.length}  map: ${t.toFixed(3)} s`;
+  if (nlink <= 20000) {
+    let [ref, tref] = time(composite_graph_ref, data);
+    check(out, ref);
+    line += `  reference: ${tref.toFixed(3)} s (${(tref / t).toFixed(0)}x)`;
+  }
+  console.log(line);
+}
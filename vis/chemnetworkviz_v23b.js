@@ -32,6 +32,9 @@ let get_scl_flux, get_flux; // grabs either series scale or global scale
 
 let procdesc;
 
+// id -> node/link of graph, kept in step with graph.nodes/links by drop_nodes()/restore_nodes()
+let node_by_id = new Map(), link_by_id = new Map();
+
 const hl_color = 'purple';
 const visible_zeroflux_width = 1;
 const visible_zeroflux_size = 3;
@@ -61,15 +64,163 @@ function arrminmax(x) {
 function main(fname1, fname2 = "none", prefix="none") {
   let _graph;
   if (fname2 === "none") {
-    _graph = d3.json(fname1) ;
+    _graph = load_graph(fname1) ;
   } else {
     _graph = Promise.all([
-      d3.json(fname1),
-      d3.json(fname2),
+      load_graph(fname1),
+      load_graph(fname2),
       prefix,
     ])
   }
-  _graph.then(work);
+  _graph.then(work).then(function() {
+    if (fname2 === "none") { return load_full_level(fname1); }
+  });
+}
+
+// levels of detail (export_lod() in preproc/graph.py): when the coarse level
+// (_lod0) is opened, it is shown first, and the full graph (last of
+// graph.lod.files) replaces it once loaded, keeping node positions placed so far
+async function load_full_level(fname) {
+  var lod = graph.graph.lod;
+  if (lod === undefined || lod.level >= lod.files.length - 1) { return; }
+  var full = new URL(lod.files[lod.files.length - 1], new URL(fname, document.baseURI));
+  var data = await load_graph(full);
+  var placed = new Map(graph.nodes.map(d => [d.id, d]));
+  data.nodes.forEach(function(d) {
+    var p = placed.get(d.id);
+    if (p !== undefined) { d.x = p.x; d.y = p.y; d.fx = p.fx; d.fy = p.fy; }
+  });
+  simulation.stop();
+  work(data);
+}
+
+// graph file is either node-link json, or columnar json (preproc/columnar.py).
+// either may be gzipped (.gz)
+const columnar_dtypes = {
+  'float32': Float32Array,
+  'float64': Float64Array,
+  'int32': Int32Array,
+};
+
+async function fetch_gz(url) {
+  let res = await fetch(url);
+  if (!res.ok) {
+    throw new Error('failed to load ' + url + ': ' + res.status);
+  }
+  if (String(url).endsWith('.gz')) {
+    res = new Response(res.body.pipeThrough(new DecompressionStream('gzip')));
+  }
+  return res;
+}
+
+async function load_graph(fname) {
+  let data = await (await fetch_gz(fname)).json();
+  if (data.format !== 'chemnetwork-columnar') {
+    return data;
+  }
+  // binary sidecar, relative to the graph file
+  let base = new URL(fname, document.baseURI);
+  let buffers = await Promise.all((data.buffers || []).map(
+    async b => (await fetch_gz(new URL(b, base))).arrayBuffer()));
+  return decode_columnar(data, buffers);
+}
+
+function decode_array(arr, buffers) {
+  let T = columnar_dtypes[arr.dtype];
+  if ('b64' in arr) {
+    let s = atob(arr.b64);
+    let u8 = new Uint8Array(s.length);
+    for (let i = 0; i < s.length; ++i) { u8[i] = s.charCodeAt(i); }
+    return new T(u8.buffer);
+  }
+  return new T(buffers[arr.buffer], arr.offset, arr.length);
+}
+
+function lazy_property(obj, name, fn) {
+  // value is made by fn() on first access
+  let set = function(v) {
+    Object.defineProperty(obj, name, {value: v, writable: true, enumerable: true, configurable: true});
+  };
+  Object.defineProperty(obj, name, {
+    get: function() { let v = fn(); set(v); return v; },
+    set: set,
+    enumerable: true,
+    configurable: true,
+  });
+}
+
+function decode_columnar(data, buffers) {
+  // nodes/links are made with scalar attributes only.  series are views
+  // into one typed array, by-process dicts are expanded on first access
+  let mats = data.dicts.material;
+  let procs = data.dicts.process;
+
+  function rows(tbl, isnode) {
+    let n = tbl.length;
+    let out = Array.from({length: n}, () => new Object());
+    for (const [name, col] of Object.entries(tbl.columns)) {
+      if (col.kind == 'scalar') {
+        let v = decode_array(col.data, buffers);
+        for (let i = 0; i < n; ++i) {
+          if (!isNaN(v[i])) { out[i][name] = v[i]; }
+        }
+      } else if (col.kind == 'series') {
+        let v = decode_array(col.data, buffers);
+        for (let i = 0; i < n; ++i) {
+          out[i][name] = v.subarray(i * col.ncol, (i + 1) * col.ncol);
+        }
+      } else if (col.kind == 'byproc') {
+        let ptr = decode_array(col.ptr, buffers);
+        let proc = decode_array(col.process, buffers);
+        let v = decode_array(col.data, buffers);
+        let ncol = Math.max(col.ncol, 1);
+        for (let i = 0; i < n; ++i) {
+          lazy_property(out[i], name, function() {
+            let dcts = Array.from({length: ncol}, () => new Object());
+            for (let k = ptr[i]; k < ptr[i+1]; ++k) {
+              for (let c = 0; c < ncol; ++c) { dcts[c][procs[proc[k]]] = v[k * ncol + c]; }
+            }
+            return col.ncol == 0 ? dcts[0] : dcts;
+          });
+        }
+        if (isnode && name == 'series_flux_byproc') {
+          // net/gross production for each case, so that work() does not expand the dicts
+          for (let i = 0; i < n; ++i) {
+            let net = new Array(ncol).fill(0), gp = new Array(ncol).fill(0), gc = new Array(ncol).fill(0);
+            for (let k = ptr[i]; k < ptr[i+1]; ++k) {
+              for (let c = 0, x; c < ncol; ++c) {
+                x = v[k * ncol + c];
+                net[c] += x;
+                gp[c] += Math.max(x, 0);
+                gc[c] += Math.min(x, 0);
+              }
+            }
+            out[i].series_net_prod = net;
+            out[i].series_gross_prod = gp;
+            out[i].series_gross_cons = gc;
+          }
+        }
+      } else {
+        col.data.forEach((x, i) => { if (x !== null) { out[i][name] = x; } });
+      }
+    }
+    return out;
+  }
+
+  let nodes = rows(data.nodes, true);
+  decode_array(data.nodes.id, buffers).forEach((x, i) => { nodes[i].id = mats[x]; });
+  let links = rows(data.links, false);
+  let src = decode_array(data.links.source, buffers);
+  let tgt = decode_array(data.links.target, buffers);
+  links.forEach((d, i) => { d.source = mats[src[i]]; d.target = mats[tgt[i]]; });
+
+  return {
+    'directed': data.directed,
+    'multigraph': data.multigraph,
+    'graph': data.graph,
+    'nodes': nodes,
+    'links': links,
+  };
 }
 
 function composite_graph(data) {
@@ -88,6 +239,7 @@ function composite_graph(data) {
 
   let len0 = g0.series_labels.length;
   let len1 = g1.series_labels.length;
+  let pdesc0 = new Set(g0.process_desc), mdesc0 = new Set(g0.material_desc);
   graph['graph'] = {
     'series_descs' : [ 
       ...g0.series_descs.map(x => g0.title + ', ' + x), 
@@ -98,111 +250,71 @@ function composite_graph(data) {
       ...g1.series_labels.map(x => prefix[1] + x),
     ],
     'title':  g0.title + ' vs. ' + g1.title ,
-    'process_desc': [ ...g0.process_desc, ...g1.process_desc.filter(x => g0.process_desc.indexOf(x) < 0)],
-    'material_desc': [ ...g0.material_desc, ...g1.material_desc.filter(x => g0.material_desc.indexOf(x) < 0)],
+    'process_desc': [ ...g0.process_desc, ...g1.process_desc.filter(x => !pdesc0.has(x))],
+    'material_desc': [ ...g0.material_desc, ...g1.material_desc.filter(x => !mdesc0.has(x))],
     'oriented': g0.oriented && g1.oriented,
     'composite': true,
   };
 
   let oriented = graph['graph'].oriented
 
-  let ns0 = data[0]['nodes'], ns1 = data[1]['nodes'];
-  let nids = ns0.map( x => x.id);
-  nids = nids.concat(ns1.map( x => x.id).filter(x => nids.indexOf(x) < 0));
-  let nodes = [];
+  // items of both graphs matched by id, in order of first graph then new ones
+  // of second graph.  item missing in one graph gets zeros for its cases
+  // (shallow copy of the other graph's item, series arrays are replaced anyway)
+  function merge(items0, items1) {
+    let by0 = new Map(), by1 = new Map();
+    items0.forEach(x => { if (!by0.has(x.id)) { by0.set(x.id, x); } });
+    items1.forEach(x => { if (!by1.has(x.id)) { by1.set(x.id, x); } });
+    let ids = [...by0.keys()];
+    by1.forEach((x, id) => { if (!by0.has(id)) { ids.push(id); } });
+
+    return ids.map(id => {
+      let x0 = by0.get(id), x1 = by1.get(id);
+      if (x0 === undefined) {
+        x0 = {...x1};
+        x0['series_flux'] = Array(len0).fill(0);
+        x0['series_flux_byproc'] = Array(len0).fill(0).map(x => new Object());
+      } else if (x1 === undefined) {
+        x1 = {...x0};
+        x1['series_flux'] = Array(len1).fill(0);
+        x1['series_flux_byproc'] = Array(len1).fill(0).map(x => new Object());
+      }
+      x0['series_flux'] = [...x0.series_flux, ...x1.series_flux];
+      x0['series_flux_byproc'] = [...x0.series_flux_byproc, ...x1.series_flux_byproc];
+      return x0;
+    });
+  }
 
   // nodes
-  for (let i=0, nid, n0, n1; i<nids.length; ++i) {
-    nid = nids[i];
-    n0 = ns0.filter(x => x.id == nid );
-    n1 = ns1.filter(x => x.id == nid );
-
-    if (n0.length == 0 && n1.length == 1) {
-      n0 = structuredClone(n1[0]);
-      n0['series_flux'] = Array(len0).fill(0);
-      n0['series_flux_byproc'] = Array(len0).fill(0).map(x => new Object());
-      n1 = n1[0];
-    } else if (n0.length == 1 && n1.length == 0) {
-      n1 = structuredClone(n0[0]);
-      n1['series_flux'] = Array(len1).fill(0);
-      n1['series_flux_byproc'] = Array(len1).fill(0).map(x => new Object());
-      n0 = n0[0];
-    } else {
-      n0 = n0[0];
-      n1 = n1[0];
-    }
-
-    nodes[i] = n0;
-    nodes[i]['series_flux'] = [...n0.series_flux, ...n1.series_flux];
-    nodes[i]['series_flux_byproc'] = [...n0.series_flux_byproc, ...n1.series_flux_byproc];
-  }
-  graph['nodes'] = nodes;
+  graph['nodes'] = merge(data[0]['nodes'], data[1]['nodes']);
 
   // links
   let ls0 = data[0]['links'], ls1 = data[1]['links']; 
   ls0.forEach(x => {x.id = x.source + ':' + x.target});
   ls1.forEach(x => {x.id = x.source + ':' + x.target});
-  let lids = ls0.map( x => x.id);
-  lids = lids.concat(ls1.map( x => x.id).filter(x => lids.indexOf(x) < 0));
-  let links = [];
-
-  for (let i=0, lid, l0, l1; i<lids.length; ++i) {
-    lid = lids[i];
-    l0 = ls0.filter(x => x.id == lid);
-    l1 = ls1.filter(x => x.id == lid);
-    [src, tgt] = lid.split(':');
-
-    if (l0.length == 0 && l1.length == 1) {
-      l0 = structuredClone(l1[0]);
-      l0['series_flux'] = Array(len0).fill(0);
-      l0['series_flux_byproc'] = Array(len0).fill(0).map(x => new Object());
-      l1 = l1[0];
-    } else if (l0.length == 1 && l1.length == 0) {
-      l1 = structuredClone(l0[0]);
-      l1['series_flux'] = Array(len1).fill(0);
-      l1['series_flux_byproc'] = Array(len1).fill(0).map(x => new Object());
-      l0 = l0[0];
-    } else {
-      l0 = l0[0]
-      l1 = l1[0]
-    }
-
-    links[i] = {
-      'source': l0.source,
-      'target': l0.target,
-      'flux': l0['flux'],
-    };
-    links[i] = l0;
-    links[i]['series_flux'] = [...l0.series_flux, ...l1.series_flux];
-    links[i]['series_flux_byproc'] = [...l0.series_flux_byproc, ...l1.series_flux_byproc];
+  let links = merge(ls0, ls1);
 
-
-  }
   if (oriented) {
     // TODO flip edge if needed
 
-    // find dual edges
-    let dups = new Map();
-    let ulinks = links.map( x => x.source < x.target ? x.source+':'+x.target : x.target+':'+x.source);
-    links.map( x => {
-      lid = x.source < x.target ? x.source+':'+x.target : x.target+':'+x.source;
-      dups.set(lid, (dups.get(lid) === undefined ? 0 : dups.get(lid)) + 1);
-    } );
-    
-    dups = [...dups.keys()].filter(x => (dups.get(x) > 1));
-
-    // merge dual edges
-    for (let i = 0, dup, lid0, lid1, link0, link1, merged, dropped; i < dups.length; ++i) {
-      dup = dups[i];
-      lid0 = dup.split(':')[0];
-      lid1 = dup.split(':')[1];
-      link0 = links.filter( x => (x.source == lid0) && (x.target == lid1 ) );
-      link0 = link0[0];
-      link1 = links.filter( x => (x.source == lid1) && (x.target == lid0 ) );
-      link1 = link1[0];
-      links.splice(links.indexOf(link0), 1);
-      links.splice(links.indexOf(link1), 1);
+    // find dual edges, a:b and b:a, in order of the first of the pair
+    let byid = new Map(links.map(x => [x.id, x]));
+    let seen = new Set();
+    let dups = links.filter(x => {
+      let rid = x.target + ':' + x.source;
+      if (x.source == x.target || seen.has(x.id) || !byid.has(rid)) { return false; }
+      seen.add(rid);
+      return true;
+    });
 
+    // merge dual edges, merged ones go to the end
+    let dropped_ids = new Set();
+    let merged_links = [];
+    for (const x of dups) {
+      // link0 from smaller to larger id
+      let rx = byid.get(x.target + ':' + x.source);
+      let [link0, link1] = x.source < x.target ? [x, rx] : [rx, x];
+      let merged, dropped;
       if (link0.flux > link1.flux) {
         merged = link0;
         dropped = link1;
@@ -210,17 +322,18 @@ function composite_graph(data) {
         merged = link1;
         dropped = link0;
       }
-      for (let j=0, proc; j < merged.series_flux.length; ++j) {
+      for (let j=0; j < merged.series_flux.length; ++j) {
         merged.series_flux[j] = merged.series_flux[j] - dropped.series_flux[j];
         for (const proc in dropped.series_flux_byproc[j]) {
-          merged.series_flux_byproc[j][proc] = ((proc in merged.series_flux_byproc[j]) ? merged.series_flux_byproc[j] : 0) - dropped.series_flux_byproc[j][proc];
+          merged.series_flux_byproc[j][proc] = ((proc in merged.series_flux_byproc[j]) ? merged.series_flux_byproc[j][proc] : 0) - dropped.series_flux_byproc[j][proc];
         }
 
       }
-
-      links.push(merged);
-
+      dropped_ids.add(link0.id);
+      dropped_ids.add(link1.id);
+      merged_links.push(merged);
     }
+    links = [...links.filter(x => !dropped_ids.has(x.id)), ...merged_links];
     
   }
 
@@ -265,7 +378,9 @@ function work(data) {
     
 
     // assume that there is series_flux_byprod, but not series_net_prod, series_gross_cons etc
+    // (columnar file comes with them, unless merged by composite_graph())
     graph.nodes.forEach ( function (d) { 
+      if (d.series_net_prod !== undefined && !graph.graph.composite) { return; }
       d.series_net_prod   = d.series_flux_byproc.map(x => Object.values(x).reduce((a,b)=>a+b, 0)); 
       d.series_gross_prod = d.series_flux_byproc.map(x => Object.values(x).reduce((a,b)=>a+Math.max(b,0), 0)); 
       d.series_gross_cons = d.series_flux_byproc.map(x => Object.values(x).reduce((a,b)=>a+Math.min(b,0), 0));
@@ -317,16 +432,18 @@ function work(data) {
 
   graph.nodes.forEach( function(d) { d.vis = {}; d.node_visible = true; d.node_visibility_elements = {}; d.label_visible = false; d.label_visibility_elements = {} } );
   graph.links.forEach( function(d) { d.vis = {}; d.link_visible = true; d.link_visibility_elements = {}; } );
-  // build edge list
+  // build edge list, and id -> node/link index
   graph.nodes.forEach( function(d) { d.edge_list = new Array()});
-  for (var i = 0, link; i < graph.links.length; ++i ) {
+  node_by_id = new Map(graph.nodes.map(d => [d.id, d]));
+  link_by_id = new Map();
+  for (var i = 0, link, node; i < graph.links.length; ++i ) {
     link = graph.links[i];
     link.id = link.source + ':' + link.target;
-    for (var ii=0, node; ii<graph.nodes.length; ++ii) {
-      node = graph.nodes[ii];
-      if (node.id == link.source ) { node.edge_list.push(link.id); }
-      if (node.id == link.target ) { node.edge_list.push(link.id); }
-    }
+    link_by_id.set(link.id, link);
+    node = node_by_id.get(link.source);
+    if (node !== undefined) { node.edge_list.push(link.id); }
+    node = node_by_id.get(link.target);
+    if (node !== undefined) { node.edge_list.push(link.id); }
   }
   // node desc (original name)
   var matdesc = {};
@@ -366,6 +483,12 @@ function work(data) {
   // construct series information
   initializeSeries();
 
+  // svg, or canvas for large network (picked again for the full level of detail)
+  if (renderer === undefined || renderer_auto) {
+    renderer = graph.links.length > canvas_renderer_min_links ? 'canvas' : 'svg';
+    renderer_auto = true;
+  }
+
   // set up all the visuals
   initializeDisplay();
 
@@ -1110,17 +1233,22 @@ function initializeDisplay() {
   canvas.selectAll(".nodes").remove();
   canvas.selectAll(".labels").remove();
 
+  // with canvas renderer, svg selections are left empty (drawCanvas() draws them)
+  initializeCanvas();
+  let svg_links = use_canvas() ? [] : graph.links;
+  let svg_nodes = use_canvas() ? [] : graph.nodes;
+
   link = canvas.append("g")
         .attr("class", "links")
     .selectAll("line")
-    .data(graph.links)
+    .data(svg_links)
     .enter().append("line")
     .on("click", linkclicked);
 
   hl_link = canvas.append("g")
         .attr("class", "hl_links")
     .selectAll("line")
-        .data(graph.links)
+        .data(svg_links)
     .enter().append("line")
     .attr("stroke", hl_color)
     .attr("opacity", 0)
@@ -1131,7 +1259,7 @@ function initializeDisplay() {
   node = canvas.append("g") 
     .attr("class", "nodes") 
     .selectAll("circle")
-    .data(graph.nodes)
+    .data(svg_nodes)
     .enter().append("circle") 
     .style('visibility','visible')
     .on('mousedown', mousedown)
@@ -1163,11 +1291,7 @@ function initializeDisplay() {
   // compromis here is to trie to use link.source.desc and link.target.desc to come up with link tooltip, but prepare
   // to fall back to the case when link.source and link.target is string for node id
   link.append("title")
-      .text(function(d) { return ( 
-        (d.source.desc === undefined ? (d.source.id === undefined ? d.source : d.source.id) : d.source.desc) 
-        + ' \u21d2 ' + 
-        (d.target.desc === undefined ? (d.target.id === undefined ? d.target : d.target.id ) : d.target.desc)
-      ); });
+      .text(link_title);
 
   // node tooltip
   node.append("title")
@@ -1179,7 +1303,7 @@ function initializeDisplay() {
   label = canvas.append("g")
   .attr("class", "labels")
   .selectAll("text")
-  .data(graph.nodes)  
+  .data(svg_nodes)  
   .enter().append("text")
   .text(function(d) { return d.id;})
   .style("text-anchor", "middle")
@@ -1208,7 +1332,7 @@ function initializeDisplay() {
   }
 
   node 
-    .attr("stroke", function(d) { if ('demand' in d) { return 'limegreen'; } else if ('supply' in d) { return 'red'; } else if ('unconstrained_raw' in d) {return '#FFBF00';} else {return 'white'; } } ) 
+    .attr("stroke", node_stroke) 
     .attr("stroke-width", 2)
     ;
   link 
@@ -1392,10 +1516,8 @@ function updateVisibility() {
   function check_edgelist(node) {
     for (var j=0, edge, link; j < node.edge_list.length; ++j) {
       edge = node.edge_list[j];
-      //link = graph.links.filter( function(d) {return d.id == edge} );
-      link = graph.links.filter( x => x.id == edge );
-      if (link.length != 1) debugger;
-      link = link[0];
+      link = link_by_id.get(edge);
+      if (link === undefined) debugger;
       if (link.link_visible ) { node.node_visible = true; };
     }
   }
@@ -1639,11 +1761,7 @@ function updateSize() {
 
 function updateLabel() {
 
-  if (displayProperties.label.use_cryptic_name) {
-    label.text(function(d) { return d.id;})
-  } else {
-    label.text(function(d) { return d.desc;})
-  }
+  label.text(label_text);
 }
 
 function updateTitle() {
@@ -1767,6 +1885,12 @@ function updateDisplay() {
     .style("font-size", function(d) {return d.label_size;});
   ;
 
+  if (use_canvas()) {
+    links_in_paintorder = graph.links.slice().sort( function (a, b) { return a.paintorder - b.paintorder });
+    node_quadtree = link_quadtree = null;
+    drawCanvas();
+  }
+
   // update barplot
   updateAllBarplot();
 
@@ -1866,43 +1990,355 @@ function detectDifference() {
 
 }
 
-function getTargetNodeCircumferencePoint(d) { 
-  //var t_radius = d.target.node_size * .8; // nodeWidth is just a custom attribute I calculate during the creation of the nodes depending on the node width 
-  //var t_radius = d.target.node_size * 1.2; // i need it bigger
-  var t_radius = d.target.node_size + 2; // maybe it is the marker stoke size?
-  //  console.log(d.target.node_size); 
-  var dx = d.target.x - d.source.x; 
-  var dy = d.target.y - d.source.y; 
-  var gamma = Math.atan2(dy,dx); // Math.atan2 returns the angle in the correct quadrant as opposed to Math.atan 
-  var tx = d.target.x - (Math.cos(gamma) * t_radius); 
-  var ty = d.target.y - (Math.sin(gamma) * t_radius); 
-  
-  return [tx,ty]; 
+//////////// CANVAS RENDERER //////////// 
+
+// for large networks, links/nodes/labels are drawn on a <canvas> under the
+// svg instead of as svg elements (svg keeps title, legend and barplots).
+// node under the pointer is found by quadtree, for drag, click and tooltip
+
+// renderer picked at load when not set by setRenderer(): canvas above this many links
+const canvas_renderer_min_links = 3000;
+
+let renderer;            // 'svg' or 'canvas'
+let renderer_auto = false;  // renderer picked by size of graph, not by setRenderer()
+let graph_canvas;        // <canvas> element, made on first use
+let node_quadtree;       // quadtree of visible nodes, null after nodes moved
+let node_quadtree_rmax;  // largest node radius in the quadtree
+let link_quadtree;       // quadtree of points along visible links, null after nodes moved
+let link_quadtree_rmax;  // largest hit distance of links in the quadtree
+const link_sample_step = 10;  // px between the points of a link in the quadtree
+let hover_event;         // last mousemove not yet hit-tested
+let links_in_paintorder = [];
+
+// arrowhead, the marker path M0,0 V30 L50,15 clipped to its viewBox, relative to refX/refY
+const arrowhead_points = [[-35, -15], [5, -3], [5, 3], [-5/3, 5], [-35, 5]];
+
+function use_canvas() { return renderer == 'canvas'; }
+
+function setRenderer(r) {
+  renderer = r;
+  renderer_auto = false;
+  initializeDisplay();
+  ticked();
 }
 
-function getSourceNodeCircumferencePoint(d) { 
+function node_stroke(d) {
+  if ('demand' in d) { return 'limegreen'; } else if ('supply' in d) { return 'red'; } else if ('unconstrained_raw' in d) {return '#FFBF00';} else {return 'white'; }
+}
+
+function label_text(d) {
+  return displayProperties.label.use_cryptic_name ? d.id : d.desc;
+}
+
+// link tooltip, see initializeDisplay() for source/target being string or node
+function link_title(d) {
+  return ( 
+    (d.source.desc === undefined ? (d.source.id === undefined ? d.source : d.source.id) : d.source.desc) 
+    + ' \u21d2 ' + 
+    (d.target.desc === undefined ? (d.target.id === undefined ? d.target : d.target.id ) : d.target.desc)
+  );
+}
+
+// ends of link on circumference of source/target (arrowhead clear of target circle)
+// to d.x1, d.y1, d.x2, d.y2
+function link_ends(d) {
+  var dx = d.target.x - d.source.x;
+  var dy = d.target.y - d.source.y;
+  var len = Math.sqrt(dx * dx + dy * dy);
   var s_radius = d.source.node_size * .8;
-  //  console.log(d.target.node_size); 
-  var dx = d.source.x - d.target.x; 
-  var dy = d.source.y - d.target.y; 
-  var gamma = Math.atan2(dy,dx); // Math.atan2 returns the angle in the correct quadrant as opposed to Math.atan 
-  var sx = d.source.x - (Math.cos(gamma) * s_radius); 
-  var sy = d.source.y - (Math.sin(gamma) * s_radius); 
-  
-  return [sx,sy]; 
+  var t_radius = d.target.node_size + 2;
+  if (len > 0) {
+    dx /= len;
+    dy /= len;
+    d.x1 = d.source.x + dx * s_radius;
+    d.y1 = d.source.y + dy * s_radius;
+  } else {
+    // coincident nodes, point along x
+    dx = 1;
+    dy = 0;
+    d.x1 = d.source.x - s_radius;
+    d.y1 = d.source.y;
+  }
+  d.x2 = d.target.x - dx * t_radius;
+  d.y2 = d.target.y - dy * t_radius;
+}
+
+// place (and make) the canvas over the area of svg
+function initializeCanvas() {
+  var on = use_canvas();
+  svg.classed('canvas_mode', on);
+  if (graph_canvas === undefined) {
+    if (! on) { return; }
+    graph_canvas = document.createElement('canvas');
+    graph_canvas.id = 'graph_canvas';
+    svg.node().parentNode.insertBefore(graph_canvas, svg.node());
+    d3.select(graph_canvas)
+      .on('click', canvasclicked)
+      .on('mousemove', canvashovered)
+      .call(d3.drag()
+        .subject(canvasdragsubject)
+        .on('start', canvasnodedragstarted)
+        .on('drag', canvasnodedragged)
+        .on('end', canvasnodedragended)
+      );
+
+    // follow the svg when the page reflows (window resized, controls panel grew/shrank)
+    window.addEventListener('resize', positionCanvas);
+    if (window.ResizeObserver !== undefined) {
+      var observer = new ResizeObserver(positionCanvas);
+      observer.observe(svg.node());
+      var controls = document.querySelector('.controls');
+      if (controls !== null) { observer.observe(controls); }
+    }
+  }
+  graph_canvas.style.display = on ? null : 'none';
+  if (! on) { return; }
+
+  var dpr = window.devicePixelRatio || 1;
+  positionCanvas();
+  graph_canvas.style.width = width + 'px';
+  graph_canvas.style.height = height + 'px';
+  graph_canvas.width = Math.round(width * dpr);
+  graph_canvas.height = Math.round(height * dpr);
+}
+
+// move the canvas to where the svg is now on the page
+function positionCanvas() {
+  if (graph_canvas === undefined || graph_canvas.style.display === 'none') { return; }
+  var rect = svg.node().getBoundingClientRect();
+  graph_canvas.style.left = (rect.left + window.scrollX) + 'px';
+  graph_canvas.style.top = (rect.top + window.scrollY) + 'px';
+}
+
+function drawArrowhead(ctx, x0, y0, x1, y1, scale) {
+  // at (x1, y1), pointing away from (x0, y0)
+  var dx = x1 - x0, dy = y1 - y0;
+  var len = Math.sqrt(dx * dx + dy * dy);
+  if (len == 0) { return; }
+  dx /= len;
+  dy /= len;
+  ctx.beginPath();
+  arrowhead_points.forEach(function(p, i) {
+    var x = x1 + (dx * p[0] - dy * p[1]) * scale;
+    var y = y1 + (dy * p[0] + dx * p[1]) * scale;
+    if (i == 0) { ctx.moveTo(x, y); } else { ctx.lineTo(x, y); }
+  });
+  ctx.closePath();
+  ctx.fill();
+}
+
+// draw links, highlight, nodes and labels, same look as the svg elements
+function drawGraph(ctx) {
+  var p = canvas.datum();
+  ctx.save();
+  ctx.translate(p.x, p.y);
+
+  // links, in paint order
+  for (const d of links_in_paintorder) {
+    if (! d.link_visible || ! (d.link_width > 0) || d.source.x === undefined) { continue; }
+    link_ends(d);
+    ctx.strokeStyle = d.color === undefined ? '#aaa' : d.color;
+    ctx.lineWidth = d.link_width;
+    ctx.setLineDash(d.visible_zeroflux ? [5, 5] : []);
+    ctx.beginPath();
+    ctx.moveTo(d.x1, d.y1);
+    ctx.lineTo(d.x2, d.y2);
+    ctx.stroke();
+
+    // marker (markerWidth 3 of viewBox 40, scaled by stroke width, or 6 px for visible_zeroflux)
+    ctx.fillStyle = 'black';
+    var scale = d.visible_zeroflux ? 6 / 40 : 3 / 40 * d.link_width;
+    if (d.reversed) {
+      drawArrowhead(ctx, d.x2, d.y2, d.x1, d.y1, scale);
+    } else {
+      drawArrowhead(ctx, d.x1, d.y1, d.x2, d.y2, scale);
+    }
+  }
+  ctx.setLineDash([]);
+
+  // highlighted links (hilight_edges())
+  ctx.strokeStyle = hl_color;
+  for (const d of graph.links) {
+    if (! (d.opacity > 0) || ! (d.hilight_width > 0) || d.source.x === undefined) { continue; }
+    link_ends(d);
+    ctx.globalAlpha = d.opacity;
+    ctx.lineWidth = d.hilight_width;
+    ctx.beginPath();
+    ctx.moveTo(d.source.x, d.source.y);
+    ctx.lineTo(d.x2, d.y2);
+    ctx.stroke();
+  }
+  ctx.globalAlpha = 1;
+
+  // nodes
+  ctx.lineWidth = 2;
+  for (const d of graph.nodes) {
+    if (! d.node_visible || ! (d.node_size > 0) || d.x === undefined) { continue; }
+    ctx.beginPath();
+    ctx.arc(d.x, d.y, d.node_size, 0, 2 * Math.PI);
+    ctx.fillStyle = displayProperties.sticky.visible && d.fx ? 'beige' : 'black';
+    ctx.fill();
+    ctx.strokeStyle = node_stroke(d);
+    ctx.stroke();
+  }
+
+  // labels
+  ctx.textAlign = 'center';
+  ctx.fillStyle = 'black';
+  ctx.strokeStyle = 'white';
+  ctx.lineWidth = .3;
+  for (const d of graph.nodes) {
+    if (! d.label_visible || d.x === undefined) { continue; }
+    var y = d.y + (displayProperties.label.pos_above_node ? d.node_size *(-1) : 0);
+    ctx.font = 'bold ' + d.label_size + 'px sans-serif';
+    ctx.fillText(label_text(d), d.x, y);
+    ctx.strokeText(label_text(d), d.x, y);
+  }
+  ctx.restore();
+}
+
+function drawCanvas() {
+  if (! use_canvas()) { return; }
+  var ctx = graph_canvas.getContext('2d');
+  var dpr = graph_canvas.width / width;
+  ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+  ctx.clearRect(0, 0, width, height);
+  drawGraph(ctx);
+}
+
+// pointer position in graph coordinates
+function graph_pointer(event) {
+  var p = canvas.datum();
+  var xy = d3.pointer(event, graph_canvas);
+  return [xy[0] - p.x, xy[1] - p.y];
+}
+
+// visible node at (x, y), undefined if none
+function find_node(x, y) {
+  if (! node_quadtree) {
+    var nodes = graph.nodes.filter(d => d.node_visible && d.x !== undefined);
+    node_quadtree = d3.quadtree(nodes, d => d.x, d => d.y);
+    node_quadtree_rmax = nodes.reduce((a, d) => Math.max(a, d.node_size), 0);
+  }
+  var d = node_quadtree.find(x, y, node_quadtree_rmax + 2);
+  if (d !== undefined && Math.hypot(d.x - x, d.y - y) <= d.node_size + 2) { return d; }
+}
+
+// visible link within a few pixels of (x, y), undefined if none
+function find_link(x, y) {
+  if (! link_quadtree) {
+    // points every link_sample_step along each link, so a link near (x, y) has one within step/2 more
+    var pts = [];
+    link_quadtree_rmax = 0;
+    for (const d of graph.links) {
+      if (! d.link_visible || ! (d.link_width > 0) || d.x1 === undefined) { continue; }
+      var n = Math.max(1, Math.ceil(Math.hypot(d.x2 - d.x1, d.y2 - d.y1) / link_sample_step));
+      for (let i = 0; i <= n; ++i) {
+        pts.push([d.x1 + (d.x2 - d.x1) * i / n, d.y1 + (d.y2 - d.y1) * i / n, d]);
+      }
+      link_quadtree_rmax = Math.max(link_quadtree_rmax, Math.max(d.link_width / 2, 2) + 1);
+    }
+    link_quadtree = d3.quadtree(pts, p => p[0], p => p[1]);
+  }
+  var r = link_quadtree_rmax + link_sample_step / 2;
+  var found, best = Infinity;
+  link_quadtree.visit(function(q, x0, y0, x1, y1) {
+    if (! q.length) {
+      do {
+        var d = q.data[2];
+        var dx = d.x2 - d.x1, dy = d.y2 - d.y1;
+        var t = (dx == 0 && dy == 0) ? 0 : Math.max(0, Math.min(1, ((x - d.x1) * dx + (y - d.y1) * dy) / (dx * dx + dy * dy)));
+        var dist = Math.hypot(d.x1 + t * dx - x, d.y1 + t * dy - y);
+        if (dist <= Math.max(d.link_width / 2, 2) + 1 && dist < best) {
+          found = d;
+          best = dist;
+        }
+      } while (q = q.next);
+    }
+    return x0 > x + r || x1 < x - r || y0 > y + r || y1 < y - r;
+  });
+  return found;
+}
+
+function canvasclicked(event) {
+  var [x, y] = graph_pointer(event);
+  var d = find_node(x, y);
+  if (d !== undefined) {
+    nodeclicked(event, d);
+    return;
+  }
+  d = find_link(x, y);
+  if (d !== undefined) { linkclicked(event, d); }
+}
+
+// hit-test at most once per frame, with the latest mousemove
+function canvashovered(event) {
+  var pending = hover_event !== undefined;
+  hover_event = event;
+  if (! pending) { requestAnimationFrame(canvashovertest); }
+}
+function canvashovertest() {
+  var [x, y] = graph_pointer(hover_event);
+  hover_event = undefined;
+  var d = find_node(x, y);
+  if (d !== undefined) {
+    graph_canvas.title = d.id;
+    return;
+  }
+  d = find_link(x, y);
+  graph_canvas.title = d !== undefined ? link_title(d) : '';
+}
+
+// drag node under the pointer, or move the whole graph (blank area, or shift key)
+function canvasdragsubject(event) {
+  var p = canvas.datum();
+  if (! event.sourceEvent.shiftKey) {
+    var d = find_node(event.x - p.x, event.y - p.y);
+    if (d !== undefined) { return d; }
+  }
+  return p;
+}
+function canvasnodedragstarted(event) {
+  if (event.subject === canvas.datum()) { return; }
+  dragstarted(event, event.subject);
+}
+function canvasnodedragged(event) {
+  var p = canvas.datum();
+  if (event.subject === p) {
+    p.x = event.x;
+    p.y = event.y;
+    canvas.attr("transform", "translate(" + p.x + "," + p.y + ")");
+    drawCanvas();
+    return;
+  }
+  dragged(event, event.subject);
+}
+function canvasnodedragended(event) {
+  if (event.subject === canvas.datum()) { return; }
+  dragended(event, event.subject);
 }
 
 // update the display positions after each simulation tick
 function ticked() { 
+  if (use_canvas()) {
+    node_quadtree = link_quadtree = null;
+    drawCanvas();
+    d3.select('#alpha_value').style('flex-basis', (simulation.alpha()*100) + '%');
+    return;
+  }
+
+  // ends of each link, once per tick
+  graph.links.forEach(link_ends);
+
   link 
     //.attr("x1", function(d) { return d.source.x; }) 
     //.attr("y1", function(d) { return d.source.y; }) 
-    .attr("x1", function(d) { return getSourceNodeCircumferencePoint(d)[0]; })
-    .attr("y1", function(d) { return getSourceNodeCircumferencePoint(d)[1]; })
+    .attr("x1", function(d) { return d.x1; })
+    .attr("y1", function(d) { return d.y1; })
     //.attr("x2", function(d) { return d.target.x; }) 
     //.attr("y2", function(d) { return d.target.y; }) 
-    .attr("x2", function(d) { return getTargetNodeCircumferencePoint(d)[0]; }) 
-    .attr("y2", function(d) { return getTargetNodeCircumferencePoint(d)[1]; }) 
+    .attr("x2", function(d) { return d.x2; }) 
+    .attr("y2", function(d) { return d.y2; }) 
   ;
 
     hl_link
@@ -1910,8 +2346,8 @@ function ticked() {
         .attr("y1", function(d) { return d.source.y; })
         //.attr("x2", function(d) { return d.target.x; })
         //.attr("y2", function(d) { return d.target.y; })
-        .attr("x2", function(d) { return getTargetNodeCircumferencePoint(d)[0]; })
-        .attr("y2", function(d) { return getTargetNodeCircumferencePoint(d)[1]; })
+        .attr("x2", function(d) { return d.x2; })
+        .attr("y2", function(d) { return d.y2; })
         ;
 
     node
@@ -1980,8 +2416,7 @@ async function importStatus() { // nodepos_fx=true, nodepos_all=false, dropnodes
 
   // drop nodes
   if (dropnodes && dropped_nodes !== undefined ) {
-    let nd = graph.nodes.filter(function(n) { return dropped_nodes.includes(n.id);}  );
-    drop_nodes(nd);
+    set_dropped_nodes(dropped_nodes);
   }
 
   // node position
@@ -2100,8 +2535,7 @@ async function importNodePositions(fxonly=false) {
   // special entries: dropped_nodes
   let dropped_nodes = nodepos['dropped_nodes'];
   if (dropped_nodes !== undefined) {
-    let nd = graph.nodes.filter(function(n) { return dropped_nodes.includes(n.id);}  );
-    drop_nodes(nd);
+    set_dropped_nodes(dropped_nodes);
   }
 
   for (let i = 0, nd, np; i < graph.nodes.length; ++i ) { 
@@ -2371,6 +2805,8 @@ function updateControls() {
   document.getElementById('title_Enabled').checked = displayProperties.title.enabled;
   toggleTitlecontrols();
 
+  document.getElementById('renderer_Canvas').checked = use_canvas();
+
   document.getElementById('label_Enabled').checked = displayProperties.label.enabled;
   document.getElementById('label_FilterSliderOutput').value = displayProperties.label.filter_level;
   document.getElementById('label_FilterSliderInput').value = displayProperties.label.filter_level;
@@ -2480,9 +2916,9 @@ function updateAllBarplot() {
         continue;
       }
       if (dataid.includes(':')) {
-        d = graph.links.filter(function(x) {return x.id == dataid})[0] ;
+        d = link_by_id.get(dataid);
       } else {
-        d = graph.nodes.filter(function(x) {return x.id == dataid})[0] ;
+        d = node_by_id.get(dataid);
       }
       updateBarplot(d, i);
     }
@@ -2722,6 +3158,12 @@ function hilight_edges(process) {
     .attr('opacity', function(d) { return d.opacity })
     .attr('stroke-width', function(d) { return d.hilight_width })
   ;
+  drawCanvas();
+}
+
+// id of end of link, source/target are node objects once in simulation
+function end_id(x) {
+  return (typeof x === 'object') ? x.id : x;
 }
 
 function drop_nodes(mynodes) {
@@ -2736,59 +3178,110 @@ function drop_nodes(mynodes) {
 
   
   console.log('drop_nodes', mynodes);
+  let gone_nodes = new Set(), gone_links = new Set();
   for (mynode of mynodes) {
-    //graph.nodes.findIndex(mynode)
-//    console.log(graph.nodes.length, graph.links.length);
+    if (! node_by_id.has(mynode.id)) { continue; }
 
     // drop node
-    graph.graph.dropped_nodes.push(
-      ...graph.nodes.splice(graph.nodes.indexOf(mynode), 1));
+    graph.graph.dropped_nodes.push(mynode);
+    gone_nodes.add(mynode);
+    node_by_id.delete(mynode.id);
+
+    // drop links of the node, and update edgelist of the other side of node
+    // (edge_list of dropped node is left as is)
+    for (const lid of mynode.edge_list) {
+      let l = link_by_id.get(lid);
+      if (l === undefined) { continue; }
+      link_by_id.delete(lid);
+      gone_links.add(l);
+      let other = node_by_id.get(end_id(l.source) == mynode.id ? end_id(l.target) : end_id(l.source));
+      if (other !== undefined) { other.edge_list.splice(other.edge_list.indexOf(lid), 1); }
+    }
+  }
 
-    // update edgelist of the other side of node
+  // remove them in one pass (nodes in place, simulation holds the array)
+  let k = 0;
+  for (const n of graph.nodes) { if (! gone_nodes.has(n)) { graph.nodes[k++] = n; } }
+  graph.nodes.length = k;
+  graph.links = graph.links.filter( function(l) { return ! gone_links.has(l); });
+  graph.graph.dropped_links.push(...gone_links);
+
+  // redraw all the nodes/links/etc
+  initializeDisplay();
 
-  //  console.log( graph.links.filter( function(l) { return l.source === mynode; }) );
-    graph.links.filter( function(l) { return l.source === mynode; })
-      .forEach(function(l) { l.target.edge_list.splice( l.target.edge_list.indexOf(mynode.id + ':' + l.target.id), 1) });
-  //  console.log( graph.links.filter( function(l) { return l.source === mynode; }) );
+  // heat up a bit
+  if (event !== undefined && ! event.active) simulation.alpha(0.1);
+}
 
-  //  console.log( graph.links.filter( function(l) { return l.target === mynode; }) );
-    graph.links.filter( function(l) { return l.target === mynode; })
-      .forEach(function(l) { l.source.edge_list.splice( l.source.edge_list.indexOf(l.source.id + ':' + mynode.id), 1) });
-  //  console.log( graph.links.filter( function(l) { return l.target === mynode; }) );
+function restore_nodes(mynodes) {
+  // bring back nodes dropped by drop_nodes(), with their links to nodes in graph
 
-    // drop links
-    graph.graph.dropped_links = graph.links.filter( function(l) { return (l.source === mynode) || (l.target === mynode); });
-    graph.links = graph.links.filter( function(l) { return (l.source !== mynode) && (l.target !== mynode); });
+  if (mynodes.constructor !== Array) {
+    restore_nodes([ mynodes ]);
+    return ;
+  }
 
-//    console.log(graph.nodes.length, graph.links.length);
+  let back = new Set(), nback = 0;
+  for (const node of mynodes) {
+    let i = graph.graph.dropped_nodes.indexOf(node);
+    if (i < 0) { continue; }
+    nback++;
+    graph.graph.dropped_nodes.splice(i, 1);
+    graph.nodes.push(node);
+    node_by_id.set(node.id, node);
+
+    // links to nodes already back in graph (incl. ones restored just before)
+    node.edge_list = [];
+    for (const l of graph.graph.dropped_links) {
+      let sid = end_id(l.source), tid = end_id(l.target);
+      if (back.has(l) || (sid != node.id && tid != node.id) || ! node_by_id.has(sid) || ! node_by_id.has(tid)) { continue; }
+      back.add(l);
+      link_by_id.set(l.id, l);
+      graph.links.push(l);
+      node_by_id.get(sid).edge_list.push(l.id);
+      node_by_id.get(tid).edge_list.push(l.id);
+    }
   }
+  if (nback < 1) { return; }
+  graph.graph.dropped_links = graph.graph.dropped_links.filter( function(l) { return ! back.has(l); });
 
   // redraw all the nodes/links/etc
+  simulation.nodes(graph.nodes);
   initializeDisplay();
+  updateForces();
 
   // heat up a bit
-  if (event !== undefined && ! event.active) simulation.alpha(0.1);
+  simulation.alpha(0.1).restart();
 }
 
-function restore_node(node) {
+function set_dropped_nodes(dropped_ids) {
+  // make the dropped set match saved list: drop listed ones, bring back the rest
+  restore_nodes(graph.graph.dropped_nodes.filter(function(n) { return ! dropped_ids.includes(n.id); }));
+  drop_nodes(graph.nodes.filter(function(n) { return dropped_ids.includes(n.id); }));
 }
 
 function exportImage(png=true, scale=1) {
   // alert('TODO\n Use this library! https://github.com/sharonchoong/svg-exportJS\n and this too https://github.com/canvg/canvg');
 
+  if (use_canvas()) {
+    // svg elements are made just for the export, then back to canvas
+    setRenderer('svg');
+    Promise.resolve(exportImage(png, scale)).finally(function() { setRenderer('canvas'); });
+    return;
+  }
 
 
 
   // this works, but
   if ( png ) { 
-    saveSvgAsPng(svg.node(), 'filename.png', { backgroundColor: '#fff', scale: scale });
+    return saveSvgAsPng(svg.node(), 'filename.png', { backgroundColor: '#fff', scale: scale });
 
     // this isn't working, got tiny, black image, somehow data does not translates to output file...
    //writePNG();
   } else {
 
     //  also, 
-    saveSvg(svg.node(), 'filename.svg', { backgroundColor: '#fff', scale: scale });
+    return saveSvg(svg.node(), 'filename.svg', { backgroundColor: '#fff', scale: scale });
   }
 
 }